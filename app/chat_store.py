@@ -0,0 +1,147 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from langflow_components.src.clients import get_supabase_client
+from langflow_components.src.resilience import get_endpoint
+from langflow_components.src.tracing import metrics
+
+# --- Write-Behind Settings ---
+# Turns are queued in memory and written by one background thread in
+# multi-row inserts, so persisting a turn never adds a round trip to the
+# response path. When the queue is full new turns are dropped (and counted)
+# rather than blocking the UI.
+QUEUE_SIZE = int(os.getenv("MERIDIAN_CHAT_QUEUE_SIZE", "1000"))
+BATCH_SIZE = int(os.getenv("MERIDIAN_CHAT_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.getenv("MERIDIAN_CHAT_FLUSH_SECONDS", "1.0"))
+
+_STOP = object()
+
+
+class ChatStore:
+    """
+    Durable session memory on top of the `chat_history` table.
+    """
+
+    def __init__(self, url: str, key: str, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, queue_size: int = QUEUE_SIZE):
+        self.url = url
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._run, name="meridian-chat-store", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # --- Write path ---
+    def record_turn(self, session_id: str, user_id: Optional[str], user_message: str, ai_response: str) -> bool:
+        """
+        Queues one turn for persistence. Returns False if it was dropped.
+        """
+        row = {
+            "turn_id": str(uuid.uuid4()),  # makes a retried batch insert idempotent
+            "session_id": session_id,
+            "user_id": user_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+        }
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            metrics.incr("chat_store.dropped")
+            print("⚠️ CHAT STORE: queue full, turn not persisted.")
+            return False
+
+    def _next_batch(self) -> List[dict]:
+        """
+        Blocks for the first row, then collects more until the batch is full
+        or `flush_interval` has passed.
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [first]
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(row)
+            if row is _STOP:
+                break
+        return batch
+
+    def _write(self, rows: List[dict]):
+        # Retries, backoff and the circuit breaker come from the shared supabase.rest policy.
+        # A retry after a lost response must not duplicate turns: rows already
+        # written are skipped on their client-generated turn_id.
+        try:
+            client = get_supabase_client(self.url, self.key)
+            get_endpoint("supabase.rest").call(
+                lambda: client.table("chat_history")
+                .upsert(rows, on_conflict="turn_id", ignore_duplicates=True)
+                .execute()
+            )
+            metrics.incr("chat_store.rows_written", len(rows))
+            metrics.incr("chat_store.batches")
+        except Exception as e:
+            metrics.incr("chat_store.failed", len(rows))
+            print(f"❌ CHAT STORE ERROR: dropped {len(rows)} turns: {e}")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            rows = [row for row in batch if row is not _STOP]
+            if rows:
+                self._write(rows)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """
+        Blocks until every queued turn has been written (or given up on).
+        """
+        self._queue.join()
+
+    def close(self):
+        if self._worker.is_alive():
+            self._queue.put(_STOP)
+            self._worker.join(timeout=10)
+
+    # --- Read path ---
+    def load_history(self, session_id: str, turns: int) -> List[dict]:
+        """
+        Rehydrates the last `turns` turns of a session as chat messages
+        (oldest first). Served by the (session_id, created_at) index; turns
+        written in one batch share created_at (now() is per transaction), so
+        the insertion-ordered id breaks ties.
+        """
+        client = get_supabase_client(self.url, self.key)
+        response = get_endpoint("supabase.rest").call(
+            lambda: client.table("chat_history")
+            .select("user_message, ai_response, created_at")
+            .eq("session_id", session_id)
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(turns)
+            .execute()
+        )
+
+        messages = []
+        for row in reversed(response.data):
+            messages.append({"role": "user", "content": row["user_message"]})
+            messages.append({"role": "assistant", "content": row["ai_response"]})
+        return messages
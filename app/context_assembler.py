@@ -0,0 +1,149 @@
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+# --- Budget Settings ---
+# Upper bound on prompt tokens sent to the LLM. The persona, instructions and
+# question are always kept; retrieved chunks and history share what is left.
+PROMPT_TOKEN_BUDGET = int(os.getenv("MERIDIAN_PROMPT_TOKEN_BUDGET", "3000"))
+KNOWLEDGE_SHARE = float(os.getenv("MERIDIAN_KNOWLEDGE_SHARE", "0.7"))  # of the variable budget
+MAX_HISTORY_MESSAGES = int(os.getenv("MERIDIAN_MAX_HISTORY_MESSAGES", "6"))
+MESSAGE_OVERHEAD = 4  # tokens the chat format adds per message
+TOKENIZER_MODEL = "gpt-4o"
+
+INSTRUCTION = (
+    "INSTRUCTION: Answer the user based ONLY on the contextual knowledge provided. "
+    "If the context is missing, say you don't know."
+)
+# Small talk has no knowledge section, so the "say you don't know" rule must not apply
+SMALL_TALK_INSTRUCTION = (
+    "INSTRUCTION: The user sent a conversational message (greeting, thanks, farewell). "
+    "Reply briefly and naturally, and offer help with Meridian. Do not state product facts."
+)
+NO_DOCUMENTS = "No relevant internal documents found for this category."
+
+
+# --- Token Counting ---
+# tiktoken is optional: without it counts fall back to ~4 characters per token,
+# which is close enough for budgeting English text.
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Token count of `text` (cached; persona and documents repeat across turns).
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4].rstrip() + " …"
+    return encoding.decode(encoding.encode(text)[:max_tokens]).rstrip() + " …"
+
+
+def _relevance(doc: dict) -> float:
+    # Hybrid retrieval ranks by the fused score; vector retrieval by similarity
+    return doc.get("score", doc.get("similarity", 0.0))
+
+
+def _format_document(doc: dict) -> str:
+    return f"[Source: {doc['doc_category'].upper()}] {doc['content']}"
+
+
+def assemble_prompt(system_persona: str, intent_category: str, documents: List[dict],
+                    history: list, user_query: str, budget: int = PROMPT_TOKEN_BUDGET,
+                    knowledge_fallback: Optional[str] = None, small_talk: bool = False) -> dict:
+    """
+    Builds the chat messages within `budget` prompt tokens.
+
+    Order: stable prefix first (persona + instructions, then earlier turns),
+    variable parts last (retrieved knowledge, question), so the provider's
+    prompt cache can reuse the prefix across turns and users of a persona.
+    Chunks are kept by relevance, history by recency; whatever does not fit
+    is dropped (the single best chunk is truncated rather than dropped).
+
+    `small_talk` swaps in SMALL_TALK_INSTRUCTION and leaves out the knowledge
+    section (no documents were retrieved).
+
+    Returns {"messages", "prompt_tokens", "documents_used", "documents_dropped",
+    "history_used"}.
+    """
+    system_prompt = f"{system_persona}\n\n{SMALL_TALK_INSTRUCTION if small_talk else INSTRUCTION}"
+    knowledge_header = "" if small_talk else f"CONTEXTUAL KNOWLEDGE ({intent_category.upper()}):\n"
+
+    # The current question is usually already the last history entry
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == user_query:
+        history = history[:-1]
+
+    fixed = (count_tokens(system_prompt) + count_tokens(knowledge_header) + count_tokens(user_query)
+             + (2 if small_talk else 3) * MESSAGE_OVERHEAD)
+    available = max(budget - fixed, 0)
+
+    # --- Knowledge: most similar chunks first ---
+    knowledge_budget = int(available * KNOWLEDGE_SHARE)
+    ranked = sorted(documents, key=_relevance, reverse=True)
+    chunks, used = [], 0
+    for doc in ranked:
+        text = _format_document(doc)
+        tokens = count_tokens(text) + 1
+        if used + tokens > knowledge_budget:
+            if not chunks:
+                text = truncate_tokens(text, knowledge_budget - 1)
+                if text:
+                    chunks.append(text)
+                    used = count_tokens(text) + 1
+            break
+        chunks.append(text)
+        used += tokens
+
+    if small_talk:
+        knowledge, used = None, 0
+    elif chunks:
+        knowledge = "\n\n".join(chunks)
+    else:
+        knowledge = knowledge_fallback or NO_DOCUMENTS
+        used = count_tokens(knowledge)
+
+    # --- History: newest turns first, within what the knowledge left over ---
+    history_budget = available - used
+    kept, history_tokens = [], 0
+    for msg in reversed(history[-MAX_HISTORY_MESSAGES:] if MAX_HISTORY_MESSAGES else []):
+        tokens = count_tokens(msg["content"]) + MESSAGE_OVERHEAD
+        if history_tokens + tokens > history_budget:
+            break
+        kept.append({"role": msg["role"], "content": msg["content"]})
+        history_tokens += tokens
+    kept.reverse()
+
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(kept)
+    if knowledge is not None:
+        messages.append({"role": "system", "content": knowledge_header + knowledge})
+    messages.append({"role": "user", "content": user_query})
+
+    return {
+        "messages": messages,
+        "prompt_tokens": fixed + used + history_tokens,
+        "documents_used": len(chunks),
+        "documents_dropped": len(documents) - len(chunks),
+        "history_used": len(kept),
+    }
@@ -1,5 +1,10 @@
+import time
+script_started = time.perf_counter()  # time to interactive / per-rerun overhead
+
 import streamlit as st
-from utils import run_meridian_pipeline
+import json
+import uuid
+from runtime import MeridianRuntime
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -80,10 +85,21 @@ personas = {
     "Marcus (CEO) - Strategic": "b0eebc99-9c0b-4ef8-bb6d-6bb9bd380a22"
 }
 
+# Streamlit re-runs this script on every interaction; the runtime (event
+# loop, pooled clients, warmed personas) is created once per process.
+@st.cache_resource
+def get_runtime() -> MeridianRuntime:
+    return MeridianRuntime(personas)
+
+runtime = get_runtime()
+
 selected_persona = st.sidebar.radio(
     "Select User Profile:",
     list(personas.keys()),
-    index=0
+    index=0,
+    key="persona",
+    # Refresh persona contexts in the background before the next question
+    on_change=lambda: runtime.prefetch(personas.values()),
 )
 user_id = personas[selected_persona]
 
@@ -95,13 +111,34 @@ st.sidebar.info(
     "3. **RAG Layer:** Retrieves only relevant vectors."
 )
 
+# Process-wide latency percentiles (all sessions)
+with st.sidebar.expander("📈 Pipeline Metrics"):
+    snapshot = runtime.metrics_snapshot()
+    startup = snapshot["runtime"]
+    if startup["time_to_interactive_ms"] is not None:
+        st.caption(f"Time to interactive {startup['time_to_interactive_ms']:.0f} ms | warm-up "
+                   + (f"{startup['warm_up_ms']:.0f} ms" if startup["ready"] else "in progress"))
+    if snapshot["stages"]:
+        st.table([{"stage": stage, **summary} for stage, summary in snapshot["stages"].items()])
+        st.json(snapshot["counters"])
+    else:
+        st.caption("No requests yet.")
+    st.download_button("Export snapshot (JSON)", json.dumps(snapshot, indent=2),
+                       file_name="meridian_metrics.json", mime="application/json")
+
 # --- MAIN CHAT INTERFACE ---
 st.title("Meridian Consultant")
 st.markdown("#### The AI that thinks before it speaks.")
 
-# Initialize Session State
+# Session id lives in the URL (?session=...), so a reload or another replica
+# picks up the same conversation from chat_history
+if "session" not in st.query_params:
+    st.query_params["session"] = str(uuid.uuid4())
+session_id = st.query_params["session"]
+
+# Initialize Session State (rehydrated once per browser session)
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = runtime.load_history(session_id)
 
 # Display Chat History
 for message in st.session_state.messages:
@@ -109,7 +146,10 @@ for message in st.session_state.messages:
         st.markdown(message["content"])
 
 # User Input
-if prompt := st.chat_input("Ask Meridian (e.g., 'What is the pricing?' or 'How do I authenticate?')"):
+prompt = st.chat_input("Ask Meridian (e.g., 'What is the pricing?' or 'How do I authenticate?')")
+runtime.record_render((time.perf_counter() - script_started) * 1000)
+
+if prompt:
     
     # 1. Display User Message
     with st.chat_message("user"):
@@ -122,23 +162,34 @@ if prompt := st.chat_input("Ask Meridian (e.g., 'What is the pricing?' or 'How d
         st.write("🔍 Identifying User Context...")
         st.write("🔀 Routing Intent...")
         
-        result = run_meridian_pipeline(
+        # Layers 1-3 run here; generation streams into the chat bubble below
+        result = runtime.stream(
             user_query=prompt,
             user_id=user_id,
             history=st.session_state.messages
         )
         
         st.write(f"📚 Retrieved {result['intent'].upper()} Knowledge...")
-        status.update(label="✅ Response Generated", state="complete", expanded=False)
+        status.update(label="✅ Context Ready — Streaming Response", state="complete", expanded=False)
 
-    # 3. Display AI Response
+    # 3. Display AI Response (token by token)
     with st.chat_message("assistant"):
-        st.markdown(result["response"])
+        st.write_stream(result["stream"])
+        if result["degraded"]:
+            st.warning(f"Degraded answer: {', '.join(result['degraded'])} unavailable, please retry shortly.")
         
         # Professional Logic Trace
         with st.expander("🛠️ View Orchestration Logs"):
             st.markdown(f"**Intent Detected:** `{result['intent'].upper()}`")
+            st.markdown(f"**Answer Cache:** `{'HIT' if result['cache_hit'] else 'MISS'}`")
+            st.markdown(f"**Model:** `{result['model'] or 'cached answer'}` ({result['model_tier']} tier)")
+            if result["ttft_ms"] is not None:
+                st.markdown(f"**Time to First Token:** `{result['ttft_ms']:.0f} ms` (total `{result['total_ms']:.0f} ms`)")
+            st.markdown("**Stage Timings:**")
+            st.table(result["trace"])
             st.markdown("**System Prompt Injected:**")
             st.code(result['context_used'], language="text")
 
-    st.session_state.messages.append({"role": "assistant", "content": result["response"]})
\ No newline at end of file
+    st.session_state.messages.append({"role": "assistant", "content": result["response"]})
+    if "generation" not in result["degraded"]:
+        runtime.persist_turn(session_id, user_id, prompt, result["response"])
\ No newline at end of file
@@ -0,0 +1,42 @@
+import os
+from typing import List
+
+# --- Model Tiers ---
+# The large model is reserved for grounded technical/business answers and for
+# big prompts; small talk and turns with no usable context go to the fast tier,
+# which answers them just as well at a fraction of the latency and price.
+FAST_MODEL = os.getenv("MERIDIAN_FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("MERIDIAN_STRONG_MODEL", "gpt-4o")
+MODEL_ROUTING_ENABLED = os.getenv("MERIDIAN_MODEL_ROUTING", "1") == "1"
+# Best cosine similarity a retrieved chunk needs before the answer counts as grounded
+MIN_GROUNDING_SIMILARITY = float(os.getenv("MERIDIAN_MIN_GROUNDING_SIMILARITY", "0.3"))
+# Grounded "general" turns whose prompt exceeds this go to the strong model
+STRONG_PROMPT_TOKENS = int(os.getenv("MERIDIAN_STRONG_PROMPT_TOKENS", "1500"))
+GROUNDED_INTENTS = {"technical", "business"}
+
+
+def best_similarity(documents: List[dict]) -> float:
+    # Hybrid rows also carry `similarity`; their RRF `score` is not comparable across queries
+    return max((doc.get("similarity") or 0.0 for doc in documents), default=0.0)
+
+
+def select_model(intent: str, needs_retrieval: bool, documents: List[dict], prompt_tokens: int) -> dict:
+    """
+    Picks the generation model for a turn from the router's intent, the
+    retrieval scores and the assembled prompt size.
+    Returns {"tier": "fast" | "strong", "model", "reason"}.
+    """
+    def tier(name: str, reason: str) -> dict:
+        return {"tier": name, "model": FAST_MODEL if name == "fast" else STRONG_MODEL, "reason": reason}
+
+    if not MODEL_ROUTING_ENABLED:
+        return tier("strong", "routing_disabled")
+    if not needs_retrieval:
+        return tier("fast", "small_talk")
+    if best_similarity(documents) < MIN_GROUNDING_SIMILARITY:
+        return tier("fast", "no_context")
+    if intent in GROUNDED_INTENTS:
+        return tier("strong", "grounded")
+    if prompt_tokens >= STRONG_PROMPT_TOKENS:
+        return tier("strong", "large_prompt")
+    return tier("fast", "simple")
@@ -1,6 +1,10 @@
+import asyncio
+import hashlib
+import json
 import os
 import sys
-from openai import OpenAI
+import threading
+import time
 from dotenv import load_dotenv
 
 # --- 1. Path Setup ---
@@ -10,9 +14,17 @@ project_root = os.path.join(current_dir, "..")
 sys.path.append(project_root)
 
 # Import our Custom Components
-from langflow_components.src.context_loader import ContextLoader
+from langflow_components.src.context_loader import FALLBACK_CONTEXT, ContextLoader
 from langflow_components.src.intent_router import IntentRouter
-from langflow_components.src.hybrid_retriever import HybridRetriever
+from langflow_components.src.hybrid_retriever import RETRIEVAL_UNAVAILABLE, HybridRetriever
+from langflow_components.src.clients import get_async_openai_client, get_openai_client
+from langflow_components.src.embedding_cache import get_embedding_cache
+from langflow_components.src.answer_cache import SemanticAnswerCache
+from langflow_components.src.resilience import get_endpoint
+from langflow_components.src.tracing import metrics, span, start_trace
+from chat_store import ChatStore
+from context_assembler import assemble_prompt
+from model_router import select_model
 
 # --- 2. Environment Setup ---
 load_dotenv(os.path.join(project_root, ".env"))
@@ -20,79 +32,417 @@ load_dotenv(os.path.join(project_root, ".env"))
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") # Must use Service Key for RLS bypass if needed
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EF_SEARCH = int(os.getenv("MERIDIAN_EF_SEARCH", "40"))
+VECTOR_BACKEND = os.getenv("MERIDIAN_VECTOR_BACKEND", "supabase")  # or "local"
+SEARCH_MODE = os.getenv("MERIDIAN_SEARCH_MODE", "vector")  # or "hybrid" (full-text + vector, RRF)
+VECTOR_STORAGE = os.getenv("MERIDIAN_VECTOR_STORAGE", "full")  # or "halfvec" / "binary" (coarse + exact re-rank)
+RERANK_FACTOR = int(os.getenv("MERIDIAN_RERANK_FACTOR", "4"))
+LOCAL_STORE_PATH = os.getenv("MERIDIAN_LOCAL_STORE", os.path.join(project_root, ".cache", "vector_store"))
+RETRIEVAL_K = int(os.getenv("MERIDIAN_RETRIEVAL_K", "5"))  # candidates; the prompt budget decides how many are used
+INTENT_MODE = os.getenv("MERIDIAN_INTENT_MODE", "keyword")  # or "centroid"
+ANSWER_CACHE_ENABLED = os.getenv("MERIDIAN_ANSWER_CACHE", "1") == "1"
+CHAT_HISTORY_ENABLED = os.getenv("MERIDIAN_CHAT_HISTORY", "1") == "1"
+HISTORY_TURNS = int(os.getenv("MERIDIAN_HISTORY_TURNS", "20"))  # turns rehydrated per session
+# Returned instead of an exception when the LLM is unreachable after retries
+GENERATION_UNAVAILABLE = (
+    "I'm having trouble reaching the language model right now. Please try again in a moment."
+)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Semantic response cache: (persona, history, intent, kb_version) + query similarity.
+# Invalidated automatically when ingestion bumps the knowledge-base version.
+answer_cache = SemanticAnswerCache()
 
-def run_meridian_pipeline(user_query: str, user_id: str, history: list):
+# --- 3. Event Loop ---
+# Async clients are pooled per event loop, so the app keeps one long-lived loop
+# on a daemon thread instead of paying for a fresh loop (and fresh connections)
+# with asyncio.run() on every turn.
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="meridian-loop", daemon=True).start()
+        return _loop
+
+def run_coroutine(coro):
     """
-    Orchestrates the 4-Layer Context Logic:
-    1. Identity: Who are you?
-    2. Intent: What do you want?
-    3. Retrieval: What do we know?
-    4. Generation: Here is the answer.
+    Runs a coroutine on the shared pipeline loop and blocks for its result.
     """
-    
-    # --- LAYER 1: IDENTITY (ContextLoader) ---
-    print(f"⚙️ [1/4] Loading Context for User: {user_id}")
-    loader = ContextLoader()
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+def load_intent_centroids():
+    """
+    Centroid routing needs one embedding per category: the corpus means when a
+    local vector store with the query embeddings' size is available, otherwise
+    the router's prototype questions (embedded once through the shared cache).
+    """
+    if os.path.exists(os.path.join(LOCAL_STORE_PATH, "manifest.json")):
+        from langflow_components.src.local_vector_store import get_local_store
+
+        store = get_local_store(LOCAL_STORE_PATH)
+        # Queries are embedded at the store's size only when searching it, at 1536 otherwise
+        query_dimensions = store.dimensions if VECTOR_BACKEND == "local" else 1536
+        if store.dimensions == query_dimensions:
+            IntentRouter.set_centroids(store.category_centroids())
+            return
+        print(f"⚠️ Local store is {store.dimensions}-d, queries are {query_dimensions}-d: "
+              f"using prototype centroids")
+    openai_client = get_openai_client(OPENAI_API_KEY)
+    IntentRouter.build_centroids(lambda texts: get_embedding_cache().embed(openai_client, texts))
+
+_chat_store = None
+_chat_store_lock = threading.Lock()
+
+def get_chat_store() -> ChatStore:
+    global _chat_store
+    with _chat_store_lock:
+        if _chat_store is None:
+            _chat_store = ChatStore(SUPABASE_URL, SUPABASE_KEY)
+        return _chat_store
+
+def persist_turn(session_id: str, user_id: str, user_message: str, ai_response: str):
+    """
+    Queues the turn for chat_history; returns immediately (write-behind).
+    """
+    if CHAT_HISTORY_ENABLED and ai_response:
+        get_chat_store().record_turn(session_id, user_id, user_message, ai_response)
+
+def load_session_history(session_id: str) -> list:
+    """
+    The most recent HISTORY_TURNS turns of a session, oldest first. A
+    database error yields an empty history rather than a broken page.
+    """
+    if not CHAT_HISTORY_ENABLED:
+        return []
+    try:
+        return get_chat_store().load_history(session_id, HISTORY_TURNS)
+    except Exception as e:
+        print(f"❌ HISTORY ERROR: {e}")
+        return []
+
+def _record_usage(record: dict, usage):
+    if usage is None:
+        return
+    record["prompt_tokens"] = usage.prompt_tokens
+    record["completion_tokens"] = usage.completion_tokens
+    metrics.incr("tokens.prompt", usage.prompt_tokens)
+    metrics.incr("tokens.completion", usage.completion_tokens)
+
+def _history_fingerprint(history: list, user_query: str) -> str:
+    """
+    Digest of the conversation before the current question ("" for a first turn).
+    """
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == user_query:
+        history = history[:-1]
+    if not history:
+        return ""
+    turns = [(msg.get("role"), msg.get("content")) for msg in history]
+    return hashlib.sha256(json.dumps(turns).encode("utf-8")).hexdigest()
+
+def _finish_trace(trace) -> float:
+    total_ms = trace.elapsed_ms
+    metrics.observe("total", total_ms)
+    metrics.incr("requests")
+    return total_ms
+
+def get_metrics_snapshot() -> dict:
+    """
+    p50/p95/p99 per stage plus token and request counters (JSON-serializable).
+    """
+    return metrics.snapshot()
+
+async def _prepare_turn(user_query: str, user_id: str, history: list) -> dict:
+    """
+    Runs layers 1-3 (identity, intent, retrieval) and assembles the prompt.
+    Identity lookup and query embedding run concurrently; latency is bounded
+    by the critical path rather than the sum of round trips.
+    """
+    trace = start_trace()
+
     # Manually injecting inputs (simulating LangFlow runtime)
+    loader = ContextLoader()
     loader.supabase_url = SUPABASE_URL
     loader.supabase_key = SUPABASE_KEY
     loader.user_id = user_id
-    
-    identity_data = loader.load_context()
-    system_persona = identity_data.data["text"]
 
-    # --- LAYER 2: INTENT (IntentRouter) ---
-    print(f"⚙️ [2/4] Analyzing Intent for: '{user_query}'")
-    router = IntentRouter()
-    router.user_query = user_query
-    
-    intent_data = router.route_intent()
-    intent_category = intent_data.data["text"]
-    print(f"   -> Detected Intent: {intent_category.upper()}")
-
-    # --- LAYER 3: KNOWLEDGE (HybridRetriever) ---
-    print(f"⚙️ [3/4] Retrieving Documents (Filter: {intent_category})")
     retriever = HybridRetriever()
     retriever.supabase_url = SUPABASE_URL
     retriever.supabase_key = SUPABASE_KEY
     retriever.openai_api_key = OPENAI_API_KEY
     retriever.search_query = user_query
-    retriever.filter_category = intent_category
-    retriever.k = 3
-    
-    docs_data = retriever.search_vectors()
-    retrieved_knowledge = docs_data.data["text"]
-
-    # --- LAYER 4: GENERATION (LLM) ---
-    print("⚙️ [4/4] Generating Response...")
-    
-    # Construct the final Prompt
-    final_system_prompt = (
-        f"{system_persona}\n\n"
-        f"CONTEXTUAL KNOWLEDGE ({intent_category.upper()}):\n"
-        f"{retrieved_knowledge}\n\n"
-        f"INSTRUCTION: Answer the user based ONLY on the context above. "
-        f"If the context is missing, say you don't know."
+    retriever.k = RETRIEVAL_K
+    retriever.ef_search = EF_SEARCH
+    retriever.backend = VECTOR_BACKEND
+    retriever.search_mode = SEARCH_MODE
+    retriever.storage = VECTOR_STORAGE
+    retriever.rerank_factor = RERANK_FACTOR
+    retriever.local_store_path = LOCAL_STORE_PATH
+
+    router = IntentRouter()
+    router.user_query = user_query
+    router.mode = INTENT_MODE
+    router.previous_response = next(
+        (msg.get("content") for msg in reversed(history) if msg.get("role") == "assistant"), None
     )
 
-    messages = [{"role": "system", "content": final_system_prompt}]
-    
-    # Append limited history (last 2 turns)
-    for msg in history[-2:]:
-        messages.append({"role": msg["role"], "content": msg["content"]})
-        
-    messages.append({"role": "user", "content": user_query})
-
-    response = client.chat.completions.create(
-        model="gpt-4o", # Or gpt-3.5-turbo
-        messages=messages,
-        temperature=0.3 # Keep it factual
+    # The router's small-talk check ("hi", "thanks!") runs up front: no embedding, no RPC
+    needs_retrieval = router.needs_retrieval()
+
+    # --- LAYER 1: IDENTITY (ContextLoader) + query embedding, concurrently ---
+    print(f"⚙️ [1/4] Loading Context for User: {user_id} (embedding query in parallel)")
+    identity_data, query_embedding = await asyncio.gather(
+        loader.aload_context(),
+        retriever.aembed_query() if needs_retrieval else asyncio.sleep(0),
+        return_exceptions=True,
     )
+    # Failures degrade the turn (generic persona, no documents) instead of
+    # reaching the prompt as error text; `degraded` lists the layers affected
+    degraded = []
+    if isinstance(identity_data, Exception):
+        print(f"❌ CONTEXT ERROR: {identity_data}")
+        system_persona, role = FALLBACK_CONTEXT, None
+        degraded.append("identity")
+    else:
+        system_persona = identity_data.data["text"]
+        role = identity_data.data.get("role")
+        if "error" in identity_data.data:
+            degraded.append("identity")
 
-    return {
-        "response": response.choices[0].message.content,
+    # --- LAYER 2: INTENT (IntentRouter) ---
+    print(f"⚙️ [2/4] Analyzing Intent for: '{user_query}'")
+    if INTENT_MODE == "centroid" and query_embedding is not None and not isinstance(query_embedding, Exception):
+        # Reuses the retrieval embedding: no extra API call for routing
+        if not IntentRouter.has_centroids():
+            await asyncio.to_thread(load_intent_centroids)
+        router.query_embedding = query_embedding
+
+    intent_data = await router.aroute_intent()
+    intent_category = intent_data.data["text"]
+    needs_retrieval = intent_data.data["needs_retrieval"]
+    print(f"   -> Detected Intent: {intent_category.upper()}")
+
+    turn = {
         "intent": intent_category,
-        "context_used": system_persona
-    }
\ No newline at end of file
+        "context_used": system_persona,
+        "cache_hit": False,
+        "cache_key": None,
+        "degraded": degraded,
+        "trace": trace,
+    }
+
+    # --- Answer cache: a similar question from the same persona, in the same
+    # conversation, skips layers 3-4. The persona text (name, role, bio) and
+    # the prior turns both shape the answer, so both are part of the key ---
+    cacheable = (ANSWER_CACHE_ENABLED and role is not None and query_embedding is not None
+                 and not isinstance(query_embedding, Exception))
+    cache_scope = (system_persona, _history_fingerprint(history, user_query))
+    if cacheable:
+        with span("answer_cache") as record:
+            cached = answer_cache.lookup(cache_scope, intent_category, query_embedding)
+            record["hit"] = cached is not None
+        if cached is not None:
+            print("⚡ ANSWER CACHE HIT: skipping retrieval and generation.")
+            turn.update(cache_hit=True, response=cached, model=None, model_tier="cache", route_reason="answer_cache")
+            return turn
+
+    # --- LAYER 3: KNOWLEDGE (HybridRetriever) ---
+    retriever.filter_category = intent_category
+
+    documents, retrieval_error = [], None
+    if not needs_retrieval:
+        print("⚙️ [3/4] Small talk: skipping retrieval")
+    elif isinstance(query_embedding, Exception):
+        print(f"❌ RETRIEVER ERROR: {query_embedding}")
+        retrieval_error = RETRIEVAL_UNAVAILABLE
+    else:
+        print(f"⚙️ [3/4] Retrieving Documents (Filter: {intent_category})")
+        docs_data = await retriever.asearch_vectors(query_embedding)
+        documents = docs_data.data.get("documents", [])
+        if "error" in docs_data.data:
+            retrieval_error = RETRIEVAL_UNAVAILABLE
+        elif cacheable:
+            # Only answers grounded on a successful retrieval are worth reusing
+            turn["cache_key"] = (cache_scope, intent_category, query_embedding)
+
+    # Persona + instructions form a stable prefix; chunks and history are
+    # trimmed to the prompt token budget
+    with span("assemble") as record:
+        prompt = assemble_prompt(system_persona, intent_category, documents, history, user_query,
+                                 knowledge_fallback=retrieval_error, small_talk=not needs_retrieval)
+        record.update(
+            prompt_tokens=prompt["prompt_tokens"],
+            documents_used=prompt["documents_used"],
+            history_used=prompt["history_used"],
+        )
+    if retrieval_error is not None:
+        degraded.append("retrieval")
+
+    # Fast model for small talk and ungrounded turns, the large one for grounded answers
+    route = select_model(intent_category, needs_retrieval, documents, prompt["prompt_tokens"])
+    print(f"   -> Model: {route['model']} ({route['tier']}, {route['reason']})")
+    metrics.incr(f"model_tier.{route['tier']}")
+    turn.update(messages=prompt["messages"], model=route["model"], model_tier=route["tier"],
+                route_reason=route["reason"])
+    return turn
+
+async def arun_meridian_pipeline(user_query: str, user_id: str, history: list):
+    """
+    Orchestrates the 4-Layer Context Logic:
+    1. Identity: Who are you?
+    2. Intent: What do you want?
+    3. Retrieval: What do we know?
+    4. Generation: Here is the answer.
+    """
+    turn = await _prepare_turn(user_query, user_id, history)
+    trace = turn["trace"]
+
+    if turn["cache_hit"]:
+        answer = turn["response"]
+    else:
+        # --- LAYER 4: GENERATION (LLM) ---
+        print("⚙️ [4/4] Generating Response...")
+        with span("generation", model=turn["model"], tier=turn["model_tier"]) as record:
+            client = get_async_openai_client(OPENAI_API_KEY)
+            try:
+                response = await get_endpoint("openai.chat").acall(lambda: client.chat.completions.create(
+                    model=turn["model"],
+                    messages=turn["messages"],
+                    temperature=0.3 # Keep it factual
+                ))
+            except Exception as e:
+                print(f"❌ GENERATION ERROR: {e}")
+                record["error"] = str(e)
+                response = None
+            else:
+                _record_usage(record, response.usage)
+
+        if response is None:
+            answer = GENERATION_UNAVAILABLE
+            turn["degraded"].append("generation")
+        else:
+            answer = response.choices[0].message.content
+            if turn["cache_key"] is not None:
+                answer_cache.store(*turn["cache_key"], answer)
+
+    total_ms = _finish_trace(trace)
+    return {
+        "response": answer,
+        "intent": turn["intent"],
+        "context_used": turn["context_used"],
+        "cache_hit": turn["cache_hit"],
+        "degraded": turn["degraded"],
+        "model": turn["model"],
+        "model_tier": turn["model_tier"],
+        "trace": trace.as_rows(),
+        "total_ms": total_ms,
+    }
+
+async def _astream_tokens(turn: dict, result: dict, started: float):
+    """
+    Yields completion tokens as they arrive and records timing on `result`.
+    """
+    trace = turn["trace"]
+
+    if turn["cache_hit"]:
+        result["ttft_ms"] = (time.perf_counter() - started) * 1000
+        result["response"] = turn["response"]
+        yield turn["response"]
+    else:
+        # Each pull runs as a separate task, so the generation span is recorded
+        # on the trace explicitly rather than through the context variable.
+        print("⚙️ [4/4] Streaming Response...")
+        generation_started = time.perf_counter()
+        record = {"model": turn["model"], "tier": turn["model_tier"]}
+        client = get_async_openai_client(OPENAI_API_KEY)
+
+        parts = []
+        try:
+            # Only opening the stream is retried: tokens already shown can't be taken back
+            stream = await get_endpoint("openai.chat").acall(lambda: client.chat.completions.create(
+                model=turn["model"],
+                messages=turn["messages"],
+                temperature=0.3,
+                stream=True,
+                stream_options={"include_usage": True},
+            ))
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    _record_usage(record, chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not parts:
+                    result["ttft_ms"] = (time.perf_counter() - started) * 1000
+                    metrics.observe("ttft", result["ttft_ms"])
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+        except Exception as e:
+            print(f"❌ GENERATION ERROR: {e}")
+            record["error"] = str(e)
+            result["degraded"].append("generation")
+            if not parts:
+                parts.append(GENERATION_UNAVAILABLE)
+                yield GENERATION_UNAVAILABLE
+
+        trace.add("generation", (time.perf_counter() - generation_started) * 1000, **record)
+        result["response"] = "".join(parts)
+        if turn["cache_key"] is not None and "generation" not in result["degraded"]:
+            answer_cache.store(*turn["cache_key"], result["response"])
+
+    _finish_trace(trace)
+    result["total_ms"] = (time.perf_counter() - started) * 1000
+    result["trace"] = trace.as_rows()
+
+_STREAM_END = object()
+
+async def _anext_or_end(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _STREAM_END
+
+def stream_meridian_pipeline(user_query: str, user_id: str, history: list) -> dict:
+    """
+    Streaming variant of run_meridian_pipeline. Layers 1-3 complete before this
+    returns, so `intent` and `context_used` are available up front; `stream` is a
+    plain iterator of tokens (e.g. for st.write_stream). Once it is exhausted the
+    dict also holds `response`, `ttft_ms` (time to first token) and `total_ms`.
+    `cache_hit` tells whether the answer came from the semantic answer cache,
+    `degraded` lists layers that fell back after a failure (identity, retrieval,
+    generation), `model_tier` tells which model answered ("fast", "strong" or
+    "cache") and `trace` holds the per-stage timing breakdown.
+    """
+    started = time.perf_counter()
+    turn = run_coroutine(_prepare_turn(user_query, user_id, history))
+
+    result = {
+        "intent": turn["intent"],
+        "context_used": turn["context_used"],
+        "cache_hit": turn["cache_hit"],
+        "degraded": turn["degraded"],
+        "model": turn["model"],
+        "model_tier": turn["model_tier"],
+        "response": "",
+        "ttft_ms": None,
+        "trace": turn["trace"].as_rows(),
+    }
+
+    def tokens():
+        agen = _astream_tokens(turn, result, started)
+        while True:
+            token = run_coroutine(_anext_or_end(agen))
+            if token is _STREAM_END:
+                return
+            yield token
+
+    result["stream"] = tokens()
+    return result
+
+def run_meridian_pipeline(user_query: str, user_id: str, history: list):
+    """
+    Blocking entry point; runs the async pipeline on the shared loop so many
+    concurrent chats share one set of pooled clients.
+    """
+    return run_coroutine(arun_meridian_pipeline(user_query, user_id, history))
@@ -0,0 +1,360 @@
+"""
+Local stand-ins for the external services, for offline benchmarks:
+
+* FakeOpenAI   -- /v1/embeddings and /v1/chat/completions (incl. SSE streaming)
+* FakeSupabase -- PostgREST table reads/inserts and the `match_documents` RPC
+
+Both add a configurable latency per request so the orchestration overhead can
+be measured against realistic round trips without network access or API spend.
+Set `error_rate` to answer that share of requests with 429/503, to exercise
+the retry and circuit-breaker paths.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+import numpy as np
+
+DIMENSIONS = 1536
+
+PROFILES = [
+    {
+        "id": "a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11",
+        "full_name": "Sarah Jenkins",
+        "role": "CTO",
+        "industry": "Fintech",
+        "bio": "Responsible for backend architecture, API security, and Python microservices.",
+    },
+    {
+        "id": "b0eebc99-9c0b-4ef8-bb6d-6bb9bd380a22",
+        "full_name": "Marcus Thorne",
+        "role": "CEO",
+        "industry": "Retail",
+        "bio": "Focused on quarterly revenue, market expansion, and competitor analysis.",
+    },
+]
+
+
+def fake_embedding(text: str, dimensions: int = DIMENSIONS) -> np.ndarray:
+    """
+    Deterministic unit vector per text (same text -> same vector).
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class _Server:
+    """
+    Runs a ThreadingHTTPServer on an ephemeral port in a daemon thread.
+    """
+
+    handler = None
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.error_rate = 0.0
+        self.faults = 0
+        handler = type("Handler", (self.handler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+    server_state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        self.server_state.requests += 1
+        if self.server_state.latency:
+            time.sleep(self.server_state.latency)
+
+    def _inject_fault(self) -> bool:
+        """
+        Answers with a transient error (429 or 503) for `error_rate` of requests.
+        """
+        if random.random() >= self.server_state.error_rate:
+            return False
+        self.server_state.faults += 1
+        body = b"injected fault"  # plain text, like an overloaded proxy
+        self.send_response(random.choice((429, 503)))
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+
+class _OpenAIHandler(_JsonHandler):
+    def do_POST(self):
+        payload = self._body()
+        self._simulate_latency()
+        if self._inject_fault():
+            return
+        path = urlparse(self.path).path
+
+        if path.endswith("/embeddings"):
+            texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            dimensions = payload.get("dimensions") or DIMENSIONS
+            tokens = sum(len(text.split()) for text in texts)
+            self._send_json({
+                "object": "list",
+                "model": payload["model"],
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions).tolist()}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        elif path.endswith("/chat/completions"):
+            self._chat(payload)
+        else:
+            self._send_json({"error": {"message": f"unknown path {path}"}}, status=404)
+
+    def _chat(self, payload: dict):
+        prompt_tokens = sum(len(m["content"].split()) for m in payload["messages"])
+        words = [f"token{i} " for i in range(self.server_state.completion_tokens)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": payload["model"]}
+
+        if not payload.get("stream"):
+            self._send_json({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in words:
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class FakeOpenAI(_Server):
+    handler = _OpenAIHandler
+
+    def __init__(self, latency_ms: float = 0.0, completion_tokens: int = 40):
+        super().__init__(latency_ms)
+        self.completion_tokens = completion_tokens
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+
+_FILTER = re.compile(r"^(eq|in)\.(.*)$")
+
+
+class _SupabaseHandler(_JsonHandler):
+    def do_GET(self):
+        self._simulate_latency()
+        if self._inject_fault():
+            return
+        parsed = urlparse(self.path)
+        table = parsed.path.rsplit("/", 1)[-1]
+        rows = self.server_state.tables.get(table, [])
+
+        params = parse_qs(parsed.query)
+        for column, values in params.items():
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            match = _FILTER.match(unquote(values[0]))
+            if not match:
+                continue
+            op, operand = match.groups()
+            allowed = {operand} if op == "eq" else set(operand.strip("()").split(","))
+            rows = [row for row in rows if str(row.get(column)) in allowed]
+
+        if "order" in params:
+            # Stable sorts from the last key to the first give the multi-key order
+            for key in reversed(params["order"][0].split(",")):
+                column, _, direction = key.partition(".")
+                rows = sorted(rows, key=lambda row: row.get(column), reverse=direction.startswith("desc"))
+        if "limit" in params:
+            rows = rows[: int(params["limit"][0])]
+
+        self._send_json(rows)
+
+    def do_POST(self):
+        payload = self._body()
+        self._simulate_latency()
+        if self._inject_fault():
+            return
+        parsed = urlparse(self.path)
+        path = parsed.path
+        name = path.rsplit("/", 1)[-1]
+        if "/rpc/" not in path:
+            rows = payload if isinstance(payload, list) else [payload]
+            table = self.server_state.tables.setdefault(name, [])
+            # Upserts with ignore-duplicates skip rows whose conflict column already exists
+            conflict = parse_qs(parsed.query).get("on_conflict", [None])[0]
+            existing = {row.get(conflict) for row in table} if conflict else set()
+            for row in rows:
+                if conflict and row.get(conflict) in existing:
+                    continue
+                table.append({"id": len(table) + 1, "created_at": time.time(), **row})
+            self._send_json(rows, status=201)
+            return
+
+        rpc = getattr(self.server_state, f"rpc_{name}", None)
+        if rpc is None:
+            self._send_json({"message": f"function {name} not found"}, status=404)
+            return
+        self._send_json(rpc(payload))
+
+
+class FakeSupabase(_Server):
+    handler = _SupabaseHandler
+
+    def __init__(self, latency_ms: float = 0.0, corpus_size: int = 1000, categories=("technical", "business")):
+        super().__init__(latency_ms)
+        self.tables = {"profiles": list(PROFILES), "chat_history": []}
+        self.documents = [
+            {
+                "id": i,
+                "content": f"Synthetic {categories[i % len(categories)]} chunk #{i} about Meridian.",
+                "metadata": {"source": f"synthetic_{i // 50}.pdf"},
+                "doc_category": categories[i % len(categories)],
+            }
+            for i in range(corpus_size)
+        ]
+        self.categories = np.array([doc["doc_category"] for doc in self.documents])
+        self.matrix = np.stack([fake_embedding(doc["content"]) for doc in self.documents]) if corpus_size else \
+            np.zeros((0, DIMENSIONS), dtype=np.float32)
+
+    def rpc_document_categories(self, params: dict) -> list:
+        return [{"doc_category": category} for category in sorted(set(self.categories.tolist()))]
+
+    def rpc_match_documents(self, params: dict) -> list:
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        query /= np.linalg.norm(query)
+        rows = np.flatnonzero(self.categories == params["filter_category"])
+        scores = self.matrix[rows] @ query
+        order = np.argsort(-scores)[: params["match_count"]]
+        return [
+            {**self.documents[rows[i]], "similarity": float(scores[i])}
+            for i in order
+            if scores[i] > params["match_threshold"]
+        ]
+
+    def rpc_match_documents_multi(self, params: dict) -> list:
+        quota = min(params.get("per_category_count") or params["match_count"], params["match_count"])
+        results = []
+        for query_index, embedding in enumerate(params["query_embeddings"]):
+            candidates = []
+            for category in params["filter_categories"]:
+                for row in self.rpc_match_documents({**params, "query_embedding": embedding,
+                                                     "filter_category": category, "match_count": quota}):
+                    candidates.append({"query_index": query_index, **row})
+            candidates.sort(key=lambda row: row["similarity"], reverse=True)
+            results.extend(candidates[: params["match_count"]])
+        return results
+
+    def rpc_match_documents_compact(self, params: dict) -> list:
+        """
+        Coarse top-(k * rerank_factor) on the 512-dim prefix (or sign bits),
+        then exact cosine on those candidates, as the SQL function does.
+        """
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        query /= np.linalg.norm(query)
+        rows = np.flatnonzero(self.categories == params["filter_category"])
+        candidates = params["match_count"] * max(params.get("rerank_factor", 4), 1)
+
+        if params.get("storage", "halfvec") == "binary":
+            coarse = -np.count_nonzero((self.matrix[rows] > 0) != (query > 0), axis=1)
+        else:
+            coarse = self.matrix[rows, :512] @ query[:512]
+        shortlist = rows[np.argsort(-coarse)[:candidates]]
+        scores = self.matrix[shortlist] @ query
+        order = np.argsort(-scores)[: params["match_count"]]
+        return [
+            {**self.documents[shortlist[i]], "similarity": float(scores[i])}
+            for i in order
+            if scores[i] > params["match_threshold"]
+        ]
+
+    def rpc_hybrid_match_documents(self, params: dict) -> list:
+        """
+        Reciprocal rank fusion of a word-overlap "full-text" ranking and the
+        vector ranking, mirroring the shape of the SQL function's output.
+        """
+        candidates = params["match_count"] * 2
+        rrf_k = params.get("rrf_k", 50)
+        rows = np.flatnonzero(self.categories == params["filter_category"])
+
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        query /= np.linalg.norm(query)
+        similarities = self.matrix[rows] @ query
+        semantic = {int(rows[i]): rank for rank, i in enumerate(np.argsort(-similarities)[:candidates], 1)}
+
+        terms = set(params["query_text"].lower().split())
+        overlaps = [(len(terms & set(self.documents[row]["content"].lower().split())), int(row)) for row in rows]
+        overlaps = sorted((item for item in overlaps if item[0]), reverse=True)[:candidates]
+        keyword = {row: rank for rank, (_, row) in enumerate(overlaps, 1)}
+
+        fused = []
+        for row in set(semantic) | set(keyword):
+            score = sum(1.0 / (rrf_k + ranks[row]) for ranks in (keyword, semantic) if row in ranks)
+            fused.append({
+                **self.documents[row],
+                "similarity": float(self.matrix[row] @ query),
+                "keyword_rank": keyword.get(row),
+                "semantic_rank": semantic.get(row),
+                "score": score,
+            })
+        fused.sort(key=lambda doc: doc["score"], reverse=True)
+        return fused[: params["match_count"]]
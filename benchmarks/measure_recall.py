@@ -0,0 +1,113 @@
+"""
+Recall and latency of the compact vector storage modes against full precision.
+
+Runs LocalVectorStore searches with storage="full" (ground truth) and with
+"halfvec"/"binary" at several re-rank factors, and reports recall@k plus
+per-query latency. Point --store at an export of the real corpus
+(`ingest_docs.py --export-local`) for meaningful numbers. Without it, a synthetic
+corpus is generated whose variance decays across dimensions, imitating
+text-embedding-3's Matryoshka layout.
+
+    python benchmarks/measure_recall.py --store .cache/vector_store --k 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from langflow_components.src.local_vector_store import LocalVectorStore, write_store
+
+
+def synthetic_corpus(path: str, rows: int, dimensions: int, seed: int = 7) -> LocalVectorStore:
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((64, dimensions)).astype(np.float32)
+    scale = (1.0 / np.sqrt(1 + np.arange(dimensions) / 64)).astype(np.float32)
+
+    def generate():
+        for i in range(rows):
+            vector = (topics[i % len(topics)] + 0.8 * rng.standard_normal(dimensions)) * scale
+            yield {
+                "content": f"synthetic chunk {i}",
+                "doc_category": "technical" if i % 2 else "business",
+                "embedding": vector,
+            }
+
+    write_store(path, generate(), dimensions)
+    return LocalVectorStore(path)
+
+
+def sample_queries(store: LocalVectorStore, count: int, seed: int = 11) -> np.ndarray:
+    """
+    Perturbed corpus vectors: realistic neighbourhoods without needing an API.
+    """
+    rng = np.random.default_rng(seed)
+    picks = []
+    for _ in range(count):
+        category = store.categories[rng.integers(len(store.categories))]
+        matrix = store.matrices[category]
+        picks.append(np.asarray(matrix[rng.integers(len(matrix))]))
+    queries = np.stack(picks)
+    return queries + 0.5 * queries.std() * rng.standard_normal(queries.shape).astype(np.float32)
+
+
+def run_mode(store, queries, k, storage, rerank_factor=1):
+    results, latencies = [], []
+    store.search(queries[0], k=k, storage=storage, rerank_factor=rerank_factor)  # builds compact matrices
+    for query in queries:
+        started = time.perf_counter()
+        matches = store.search(query, k=k, threshold=-1.0, storage=storage, rerank_factor=rerank_factor)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({(match["doc_category"], match["id"]) for match in matches})
+    latencies.sort()
+    return results, {
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of compact storage vs full precision.")
+    parser.add_argument("--store", help="Local vector store directory (default: synthetic corpus).")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic corpus size.")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Synthetic embedding size.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank-factors", default="1,2,4,8", help="Comma-separated factors to try.")
+    parser.add_argument("--output", help="Optional JSON report path.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.store:
+            store = LocalVectorStore(args.store)
+        else:
+            print(f"🧪 Generating synthetic corpus: {args.rows} x {args.dimensions}")
+            store = synthetic_corpus(workdir, args.rows, args.dimensions)
+
+        queries = sample_queries(store, args.queries)
+        truth, full_latency = run_mode(store, queries, args.k, "full")
+        report = {"k": args.k, "queries": args.queries, "full": full_latency, "modes": []}
+        print(f"full     recall@{args.k} 1.000 | p50 {full_latency['p50_ms']:.3f} ms | p95 {full_latency['p95_ms']:.3f} ms")
+
+        for storage in ("halfvec", "binary"):
+            for factor in (int(f) for f in args.rerank_factors.split(",")):
+                found, latency = run_mode(store, queries, args.k, storage, factor)
+                recall = np.mean([len(a & b) / max(len(a), 1) for a, b in zip(truth, found)])
+                report["modes"].append({"storage": storage, "rerank_factor": factor,
+                                        "recall": round(float(recall), 4), **latency})
+                print(f"{storage:<8} x{factor:<2} recall@{args.k} {recall:.3f} | "
+                      f"p50 {latency['p50_ms']:.3f} ms | p95 {latency['p95_ms']:.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Startup cost of the Streamlit app: time to import the app modules, runtime
+warm-up, and the first turn with and without a warmed MeridianRuntime.
+
+Each scenario runs in a fresh interpreter (cold imports, empty caches) against
+the local OpenAI/Supabase stand-ins, so it measures exactly what a newly
+started app process pays before and during its first interaction.
+
+    python benchmarks/measure_startup.py --runs 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+
+TURNS = ["How do I authenticate against the API with a token?", "What is the pricing for the enterprise plan?"]
+
+
+def child(scenario: str):
+    """
+    One measurement in this (fresh) process; prints a JSON line.
+    """
+    sys.path.insert(0, BENCH_DIR)
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+    sys.path.insert(0, PROJECT_ROOT)
+    from fake_servers import PROFILES
+
+    personas = {profile["full_name"]: profile["id"] for profile in PROFILES}
+    report = {}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        import runtime
+        import utils
+        report["import_ms"] = (time.perf_counter() - started) * 1000
+
+        if scenario == "warm":
+            app_runtime = runtime.MeridianRuntime(personas)
+            app_runtime.ready.wait()
+            report["warm_up_ms"] = app_runtime.warm_up_ms
+
+        for n, query in enumerate(TURNS):
+            started = time.perf_counter()
+            result = utils.stream_meridian_pipeline(query, PROFILES[0]["id"], [])
+            report[f"turn_{n + 1}_ready_ms"] = (time.perf_counter() - started) * 1000  # layers 1-3 done
+            for _ in result["stream"]:
+                pass
+            report[f"turn_{n + 1}_ttft_ms"] = result["ttft_ms"]
+
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, warm-up and first-turn latency of the app.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per scenario.")
+    parser.add_argument("--openai-latency-ms", type=float, default=50.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=20.0)
+    parser.add_argument("--child", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    from fake_servers import FakeOpenAI, FakeSupabase
+
+    with FakeOpenAI(args.openai_latency_ms, completion_tokens=5) as openai_server, \
+            FakeSupabase(args.supabase_latency_ms, corpus_size=200) as supabase_server, \
+            tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            SUPABASE_URL=supabase_server.url,
+            SUPABASE_SERVICE_KEY="bench.fake.key",
+            OPENAI_API_KEY="sk-bench",
+            OPENAI_BASE_URL=openai_server.base_url,
+            MERIDIAN_KB_VERSION_FILE=os.path.join(workdir, "kb_version"),
+            MERIDIAN_ANSWER_CACHE="0",
+        )
+
+        results = {"cold": [], "warm": []}
+        for run in range(args.runs):
+            for scenario in results:
+                # A fresh embedding cache per process: nothing carries over between runs
+                env["MERIDIAN_EMBEDDING_CACHE"] = os.path.join(workdir, f"embeddings-{scenario}-{run}.sqlite3")
+                output = subprocess.run([sys.executable, __file__, "--child", scenario], env=env,
+                                        capture_output=True, text=True, check=True).stdout
+                results[scenario].append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"🚀 Startup ({args.runs} fresh processes per scenario, median ms)")
+    for scenario, runs in results.items():
+        medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+        label = "without runtime" if scenario == "cold" else "with warmed runtime"
+        print(f"   {label:<20} " + " | ".join(f"{key} {value}" for key, value in medians.items()))
+
+
+if __name__ == "__main__":
+    main()
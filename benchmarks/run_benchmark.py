@@ -0,0 +1,217 @@
+"""
+Offline load test for the Meridian pipeline.
+
+Starts local OpenAI/Supabase stand-ins (benchmarks/fake_servers.py), points the
+app at them through environment variables and drives arun_meridian_pipeline()
+with N concurrent simulated users. Reports throughput, end-to-end and per-stage
+latency percentiles and (optionally) allocations per request, and writes the
+numbers to a JSON file so runs can be compared before/after a change.
+
+    python benchmarks/run_benchmark.py --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+sys.path.insert(0, PROJECT_ROOT)
+
+from fake_servers import PROFILES, FakeOpenAI, FakeSupabase
+
+QUERIES = [
+    "How do I authenticate against the API with a token?",
+    "What is the pricing for the enterprise plan?",
+    "How do I connect to the websocket endpoint from Python?",
+    "What ROI can a retail business expect?",
+    "Tell me about Meridian.",
+    "Which database schema do you recommend?",
+    "How do you compare to competitors in the market?",
+]
+
+
+def percentiles(samples: list, unit: str = "ms") -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        f"mean_{unit}": round(sum(ordered) / len(ordered), 2),
+        f"p50_{unit}": pick(50),
+        f"p95_{unit}": pick(95),
+        f"p99_{unit}": pick(99),
+        f"max_{unit}": round(ordered[-1], 2),
+    }
+
+
+def configure_environment(args, openai_server, supabase_server, workdir: str):
+    """
+    Must run before app.utils is imported: the app reads its settings at import time.
+    """
+    os.environ.update({
+        "SUPABASE_URL": supabase_server.url,
+        "SUPABASE_SERVICE_KEY": "bench.fake.key",  # JWT-shaped, accepted by create_client()
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": openai_server.base_url,
+        "MERIDIAN_EMBEDDING_CACHE": os.path.join(workdir, "embeddings.sqlite3"),
+        "MERIDIAN_KB_VERSION_FILE": os.path.join(workdir, "kb_version"),
+        "MERIDIAN_ANSWER_CACHE": "1" if args.answer_cache else "0",
+        "MERIDIAN_HTTP_POOL_SIZE": str(max(args.concurrency, 1)),
+        # Fake embeddings are random, so similarities carry no signal: route on intent alone
+        "MERIDIAN_MIN_GROUNDING_SIMILARITY": "0",
+    })
+
+
+def build_workload(args) -> list:
+    """
+    (query, user_id) pairs. With --distinct N only N different questions are
+    asked, so caches get exercised; by default every request is unique.
+    """
+    distinct = args.distinct or args.requests
+    workload = []
+    for i in range(args.requests):
+        n = i % distinct
+        query = f"{QUERIES[n % len(QUERIES)]} (variant {n})"
+        workload.append((query, PROFILES[i % len(PROFILES)]["id"]))
+    return workload
+
+
+async def drive(pipeline, workload: list, concurrency: int, trace_alloc: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, cache_hits, degraded = [], 0, 0, 0
+    tiers = {}
+    peaks = []
+
+    async def one(query: str, user_id: str):
+        nonlocal errors, cache_hits, degraded
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await pipeline(query, user_id, [])
+            except Exception as e:
+                errors += 1
+                print(f"❌ request failed: {e}", file=sys.stderr)
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+            cache_hits += result["cache_hit"]
+            degraded += bool(result["degraded"])
+            tiers[result["model_tier"]] = tiers.get(result["model_tier"], 0) + 1
+            if trace_alloc and concurrency == 1:
+                # Peaks only mean "per request" when requests do not overlap
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+
+    blocks_before = sys.getallocatedblocks()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(query, user_id) for query, user_id in workload))
+    wall = time.perf_counter() - started
+    blocks_after = sys.getallocatedblocks()
+
+    completed = len(latencies)
+    report = {
+        "completed": completed,
+        "errors": errors,
+        "cache_hits": cache_hits,
+        "degraded": degraded,
+        "model_tiers": tiers,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(completed / wall, 2) if wall else 0.0,
+        "latency": percentiles(latencies),
+        "allocated_blocks_delta_per_request": round((blocks_after - blocks_before) / max(completed, 1), 1),
+    }
+    if peaks:
+        report["peak_traced_memory_per_request"] = percentiles([p / 1024 for p in peaks], unit="kib")
+    return report
+
+
+async def run(args, utils) -> dict:
+    workload = build_workload(args)
+
+    if args.warmup:
+        await drive(utils.arun_meridian_pipeline, workload[: args.warmup], args.concurrency, False)
+        utils.metrics.reset()  # keep warm-up samples out of the stage histograms
+
+    if args.trace_alloc:
+        tracemalloc.start()
+    try:
+        return await drive(utils.arun_meridian_pipeline, workload, args.concurrency, args.trace_alloc)
+    finally:
+        if args.trace_alloc:
+            tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Meridian pipeline.")
+    parser.add_argument("--requests", type=int, default=100, help="Total pipeline runs.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Simulated users in flight.")
+    parser.add_argument("--distinct", type=int, default=0, help="Distinct questions (0 = all unique).")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed runs before measuring.")
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Synthetic documents in the fake DB.")
+    parser.add_argument("--openai-latency-ms", type=float, default=50.0, help="Simulated OpenAI round trip.")
+    parser.add_argument("--supabase-latency-ms", type=float, default=20.0, help="Simulated Supabase round trip.")
+    parser.add_argument("--completion-tokens", type=int, default=40, help="Tokens in each fake answer.")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of fake-service requests answered with 429/503 (tests retries).")
+    parser.add_argument("--answer-cache", action="store_true", help="Enable the semantic answer cache.")
+    parser.add_argument("--trace-alloc", action="store_true",
+                        help="Track allocations with tracemalloc (slower; per-request peaks need --concurrency 1).")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", "latest.json"),
+                        help="Where to write the JSON report.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's debug prints.")
+    args = parser.parse_args()
+
+    print(f"🏁 Benchmark: {args.requests} requests, concurrency {args.concurrency}, corpus {args.corpus_size}")
+
+    with FakeOpenAI(args.openai_latency_ms, args.completion_tokens) as openai_server, \
+            FakeSupabase(args.supabase_latency_ms, args.corpus_size) as supabase_server, \
+            tempfile.TemporaryDirectory() as workdir:
+        openai_server.error_rate = supabase_server.error_rate = args.error_rate
+        configure_environment(args, openai_server, supabase_server, workdir)
+        import utils
+
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            report = asyncio.run(run(args, utils))
+
+        report["stages"] = utils.get_metrics_snapshot()["stages"]
+        report["requests_to_fakes"] = {"openai": openai_server.requests, "supabase": supabase_server.requests}
+        report["injected_faults"] = openai_server.faults + supabase_server.faults
+        report["resilience"] = {name: value for name, value in utils.get_metrics_snapshot()["counters"].items()
+                                if name.startswith("resilience.")}
+
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "verbose")}
+    report["environment"] = {"python": platform.python_version(), "platform": platform.platform()}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    latency = report["latency"]
+    print(f"✅ {report['completed']} ok ({report['degraded']} degraded) / {report['errors']} errors "
+          f"in {report['wall_seconds']}s -> {report['throughput_rps']} req/s")
+    print(f"   model tiers {report['model_tiers']}")
+    if report["injected_faults"]:
+        print(f"   injected faults {report['injected_faults']} | {report['resilience']}")
+    if latency["count"]:
+        print(f"   end-to-end p50 {latency['p50_ms']} ms | p95 {latency['p95_ms']} ms | p99 {latency['p99_ms']} ms")
+    for stage, summary in sorted(report["stages"].items()):
+        print(f"   {stage:<14} p50 {summary['p50_ms']:8.2f} ms | p95 {summary['p95_ms']:8.2f} ms")
+    print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,113 @@
+import argparse
+import json
 import os
+import sys
+import time
 from dotenv import load_dotenv
 from supabase import create_client
 
-load_dotenv()
+# Categories the intent router can send queries to; each needs documents and a partial HNSW index
+EXPECTED_CATEGORIES = ["technical", "business"]
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase = create_client(url, key)
 
-print("--- DIAGNOSTIC: Checking Knowledge Base ---")
+def human_bytes(size) -> str:
+    size = float(size or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
 
-# 1. Count Total Docs
-response = supabase.table("documents").select("id", count="exact").execute()
-print(f"✅ Total Documents found: {len(response.data)}")
 
-# 2. Check Categories
-tech_docs = supabase.table("documents").select("*").eq("doc_category", "technical").execute()
-biz_docs = supabase.table("documents").select("*").eq("doc_category", "business").execute()
+def find_problems(stats: dict) -> list:
+    """
+    Health checks over the corpus_stats() report; an empty list means healthy.
+    """
+    problems = []
+    categories = {row["doc_category"]: row for row in stats["categories"]}
+    vector_indexes = [index for index in stats["indexes"] if index["method"] == "hnsw"]
 
-print(f"📊 Technical Docs: {len(tech_docs.data)}")
-print(f"📊 Business Docs: {len(biz_docs.data)}")
+    for name in EXPECTED_CATEGORIES:
+        if not categories.get(name, {}).get("documents"):
+            problems.append(f"No {name} documents found. Re-run ingestion!")
 
-if len(tech_docs.data) > 0:
-    print("\n✅ Sample Technical Doc Content:")
-    print(f"   -> {tech_docs.data[0]['content'][:100]}...")
-else:
-    print("\n❌ CRITICAL: No Technical documents found. Re-run ingestion!")
\ No newline at end of file
+    for name, row in categories.items():
+        if row["null_embeddings"]:
+            problems.append(f"{row['null_embeddings']} {name} chunks have no embedding.")
+        if row.get("wrong_dimension_embeddings"):
+            problems.append(f"{row['wrong_dimension_embeddings']} {name} embeddings are not "
+                            f"{stats['declared_dimensions'] or 1536}-dimensional.")
+        has_partial = any(f"'{name}'" in (index["predicate"] or "") for index in vector_indexes)
+        if name and not has_partial:
+            problems.append(f"No partial HNSW index for doc_category '{name}' (see 20250103_ann_index.sql).")
+
+    for index in stats["indexes"]:
+        if not index["valid"]:
+            problems.append(f"Index {index['name']} is invalid (failed concurrent build?). Rebuild it.")
+    return problems
+
+
+def print_report(stats: dict, elapsed_ms: float):
+    print("--- DIAGNOSTIC: Checking Knowledge Base ---")
+    table = stats["table"]
+    total = sum(row["documents"] for row in stats["categories"])
+    approx = "~" if any(row.get("documents_estimated") for row in stats["categories"]) else ""
+    print(f"✅ Total Documents found: {approx}{total} "
+          f"(table {human_bytes(table['table_bytes'])}, with indexes {human_bytes(table['total_bytes'])})")
+    print(f"   Embedding column: vector({stats['declared_dimensions'] or '?'}) | "
+          f"dead rows {table['dead_rows']} | last analyzed {table['last_analyzed_at'] or 'never'}")
+
+    for row in stats["categories"]:
+        wrong = row.get("wrong_dimension_embeddings")
+        # Without --deep, counts are planner estimates and per-row figures are skipped
+        count = f"~{row['documents']}" if row.get("documents_estimated") else str(row["documents"])
+        print(f"📊 {str(row['doc_category']).title()} Docs: {count}"
+              + (f" from {row['sources']} sources | avg chunk {row['avg_chunk_bytes']} B"
+                 if row.get("sources") is not None else "")
+              + f" | newest {row['newest_ingested_at']} | null embeddings {row['null_embeddings']}"
+              + (f" | wrong dimension {wrong}" if wrong is not None else "")
+              + (f" | unhashed {row['unhashed_rows']}" if row["unhashed_rows"] else ""))
+
+    print("\n🗂️ Indexes:")
+    for index in stats["indexes"]:
+        scope = f" where {index['predicate']}" if index["predicate"] else ""
+        print(f"   {index['name']:<45} {index['method']:<6} {human_bytes(index['bytes']):>8} | "
+              f"{index['scans']} scans{scope}")
+
+    print(f"\n⏱️ Stats computed server-side in {elapsed_ms:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge-base health check via the corpus_stats RPC.")
+    parser.add_argument("--deep", action="store_true",
+                        help="Exact counts, sources, chunk size and wrong-dimension embeddings "
+                             "(scans the table and reads every embedding).")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+
+    started = time.perf_counter()
+    try:
+        stats = supabase.rpc("corpus_stats", {"deep": args.deep}).execute().data
+    except Exception as e:
+        print(f"❌ corpus_stats RPC failed: {e}")
+        print("   Apply the migrations up to 20250111_corpus_stats_fast.sql and retry.")
+        return 2
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    problems = find_problems(stats)
+    if args.json:
+        print(json.dumps({**stats, "problems": problems}, indent=2, default=str))
+    else:
+        print_report(stats, elapsed_ms)
+        for problem in problems:
+            print(f"❌ CRITICAL: {problem}")
+        if not problems:
+            print("✅ Knowledge base looks healthy.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
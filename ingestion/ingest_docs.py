@@ -1,13 +1,26 @@
+import argparse
+import hashlib
 import os
 import sys
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterable, Iterator, List, Set
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from openai import OpenAI
+from supabase import Client
 
 # --- 1. Robust Environment Loading ---
 # Get the absolute path of the directory containing this script
 current_dir = os.path.dirname(os.path.abspath(__file__))
+# Make the shared component package importable (same layout as app/utils.py)
+sys.path.append(os.path.join(current_dir, ".."))
+
+from langflow_components.src.clients import get_openai_client, get_supabase_client
+from langflow_components.src.embedding_cache import get_embedding_cache
+from langflow_components.src.answer_cache import bump_kb_version
+from langflow_components.src.resilience import get_endpoint
+from loaders import CHUNK_OVERLAP, CHUNK_SIZE, PARSE_WORKERS, load_directory, validate_chunking
+
 # Construct path to .env (one level up)
 env_path = os.path.join(current_dir, "..", ".env")
 
@@ -37,8 +50,8 @@ if not SUPABASE_URL:
 
 # --- 2. Initialize Clients ---
 try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+    openai_client = get_openai_client(OPENAI_API_KEY)
 except Exception as e:
     print(f"❌ Client Initialization Error: {e}")
     sys.exit(1)
@@ -79,48 +92,283 @@ raw_documents = [
     }
 ]
 
-def generate_embedding(text: str) -> List[float]:
-    try:
-        response = openai_client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small"
+# --- 4. Pipeline Settings ---
+EMBEDDING_MODEL = "text-embedding-3-small"
+BATCH_SIZE = int(os.getenv("MERIDIAN_INGEST_BATCH_SIZE", "64"))
+WORKERS = int(os.getenv("MERIDIAN_INGEST_WORKERS", "4"))
+CHECKPOINT_PATH = os.path.join(current_dir, ".ingest_checkpoint")
+
+def generate_embeddings(texts: List[str], dimensions: int = None) -> List[List[float]]:
+    """
+    Embeds a whole batch in one request (cache hits are not re-sent; the
+    on-disk cache is shared with HybridRetriever, so re-runs skip known texts).
+    `dimensions` asks the API for shortened vectors (default: full 1536).
+    """
+    return get_embedding_cache().embed(openai_client, texts, model=EMBEDDING_MODEL, dimensions=dimensions)
+
+def chunk_metadata(doc: dict) -> dict:
+    # Loader chunks carry page/offset/chunk; the built-in documents only a source
+    return {"source": doc["source"], **doc.get("metadata", {})}
+
+def content_hash(doc: dict) -> str:
+    """
+    Stable identity of a chunk. Stored in documents.content_hash (unique), so
+    unchanged chunks are skipped and changed ones get a new row.
+    """
+    raw = f"{doc['category']}|{doc['source']}|{doc['content']}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def batched(items: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class Checkpoint:
+    """
+    Append-only log of already-ingested document keys (one per line), flushed
+    after every batch so a crashed run can resume where it stopped.
+    """
+
+    def __init__(self, path: str, resume: bool = True):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def mark(self, keys: List[str]):
+        with self._lock:
+            self.done.update(keys)
+            with open(self.path, "a") as f:
+                f.write("".join(f"{key}\n" for key in keys))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def fetch_existing_hashes(page_size: int = 1000) -> Set[str]:
+    """
+    Reads every stored content_hash (hashes only, never embeddings), page by page.
+    Keyset pagination (id > last id seen) makes each page a primary-key range
+    scan; an OFFSET would rescan every row before it, quadratic in the corpus.
+    """
+    hashes = set()
+    last_id = 0
+    while True:
+        response = get_endpoint("supabase.rest").call(
+            lambda: supabase.table("documents")
+            .select("id, content_hash")
+            .gt("id", last_id)
+            .not_.is_("content_hash", "null")
+            .order("id")
+            .limit(page_size)
+            .execute()
         )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"❌ Error generating embedding: {e}")
-        return []
-
-def ingest_data():
-    print(f"🚀 Starting Ingestion for {len(raw_documents)} documents...")
-
-    for doc in raw_documents:
-        content = doc["content"]
-        category = doc["category"]
-        metadata = {"source": doc["source"]}
-
-        print(f"🔹 Processing [{category}]: {content[:30]}...")
-
-        # A. Generate Vector
-        embedding = generate_embedding(content)
-        
-        if not embedding:
-            continue
-
-        # B. Prepare Payload
-        data_payload = {
-            "content": content,
-            "metadata": metadata,
-            "doc_category": category,
-            "embedding": embedding
+        hashes.update(row["content_hash"] for row in response.data)
+        if len(response.data) < page_size:
+            return hashes
+        last_id = response.data[-1]["id"]
+
+def prune_stale(stale_hashes: Set[str], chunk_size: int = 200) -> int:
+    """
+    Deletes chunks whose source text disappeared or changed, plus legacy rows
+    ingested before content hashing existed.
+    """
+    stale = sorted(stale_hashes)
+    rest = get_endpoint("supabase.rest")
+    for start in range(0, len(stale), chunk_size):
+        chunk = stale[start:start + chunk_size]
+        rest.call(lambda: supabase.table("documents").delete().in_("content_hash", chunk).execute())
+    rest.call(lambda: supabase.table("documents").delete().is_("content_hash", "null").execute())
+    return len(stale)
+
+def process_batch(batch: List[dict]) -> int:
+    """
+    Embeds a batch of documents and writes it with a single multi-row upsert.
+    """
+    embeddings = generate_embeddings([doc["content"] for doc in batch])
+
+    payloads = [
+        {
+            "content": doc["content"],
+            "metadata": chunk_metadata(doc),
+            "doc_category": doc["category"],
+            "embedding": embedding,
+            "content_hash": content_hash(doc),
         }
+        for doc, embedding in zip(batch, embeddings)
+    ]
+
+    # Upserts are keyed by content_hash, so a retried batch cannot duplicate rows
+    get_endpoint("supabase.rest").call(
+        lambda: supabase.table("documents").upsert(payloads, on_conflict="content_hash").execute()
+    )
+    return len(payloads)
+
+def ingest_data(documents: Iterable[dict] = None, batch_size: int = BATCH_SIZE,
+                workers: int = WORKERS, checkpoint_path: str = CHECKPOINT_PATH, resume: bool = True,
+                prune: bool = True):
+    """
+    Incremental sync: only new or changed chunks are embedded and upserted.
+    With prune=True, `documents` is treated as the full corpus and rows whose
+    hash is no longer present are deleted afterwards.
+    """
+    documents = raw_documents if documents is None else documents
+    checkpoint = Checkpoint(checkpoint_path, resume=resume)
+    existing = fetch_existing_hashes()
+    seen = set()
+    unchanged = 0
 
-        # C. Insert into Database
-        try:
-            response = supabase.table("documents").insert(data_payload).execute()
-        except Exception as e:
-            print(f"❌ Insert Failed: {e}")
+    def pending_docs() -> Iterator[dict]:
+        nonlocal unchanged
+        for doc in documents:
+            key = content_hash(doc)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key in existing or key in checkpoint.done:
+                unchanged += 1
+                continue
+            yield doc
 
+    if checkpoint.done:
+        print(f"⏩ Resuming: {len(checkpoint.done)} documents already ingested.")
+    print(f"🚀 Starting Ingestion (batch={batch_size}, workers={workers}, {len(existing)} chunks stored)...")
+
+    cache = get_embedding_cache()
+    tokens_before = cache.tokens_used
+    started = time.perf_counter()
+    ingested = 0
+    failed = 0
+
+    # Bounded pool: at most 2 batches per worker are in flight, so memory stays
+    # flat even when `documents` is a long generator.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+        batches = batched(pending_docs(), batch_size)
+
+        def submit_next() -> bool:
+            batch = next(batches, None)
+            if batch is None:
+                return False
+            in_flight[pool.submit(process_batch, batch)] = batch
+            return True
+
+        while len(in_flight) < workers * 2 and submit_next():
+            pass
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    ingested += future.result()
+                    checkpoint.mark([content_hash(doc) for doc in batch])
+                    print(f"🔹 Ingested batch of {len(batch)} [{batch[0]['category']}]: {batch[0]['content'][:30]}...")
+                except Exception as e:
+                    failed += len(batch)
+                    print(f"❌ Batch Failed ({len(batch)} docs): {e}")
+                submit_next()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    tokens = cache.tokens_used - tokens_before
+    print(f"📈 {ingested} docs in {elapsed:.2f}s -> {ingested / elapsed:.1f} docs/sec, {tokens / elapsed:.1f} tokens/sec")
+    print(f"⏭️ Skipped {unchanged} unchanged chunks.")
+
+    deleted = 0
+    if failed:
+        # Never prune after a partial run: the missing rows would look stale.
+        print(f"⚠️ {failed} documents failed. Re-run to resume from {checkpoint_path}.")
+    elif prune:
+        deleted = prune_stale(existing - seen)
+        print(f"🧹 Removed {deleted} stale chunks.")
+
+    if ingested or deleted:
+        # Invalidates answers the app cached against the previous corpus
+        bump_kb_version()
+
+    if failed:
+        return
+
+    checkpoint.clear()
     print("✅ Ingestion Complete. Knowledge Base is ready.")
 
+def export_local_store(path: str, documents: Iterable[dict] = None, batch_size: int = BATCH_SIZE,
+                       dimensions: int = None) -> dict:
+    """
+    Writes the corpus in the LocalVectorStore format (memory-mapped float32,
+    partitioned by doc_category) for HybridRetriever's local backend.
+    Embeddings come from the shared cache, so exporting after a sync is free.
+    With `dimensions` (e.g. 512) the store holds shortened embeddings; the
+    retriever reads the size from the manifest and embeds queries to match.
+    """
+    # Imported lazily so NumPy is only required when exporting
+    from langflow_components.src.local_vector_store import write_store
+
+    documents = raw_documents if documents is None else documents
+
+    def rows() -> Iterator[dict]:
+        for batch in batched(documents, batch_size):
+            embeddings = generate_embeddings([doc["content"] for doc in batch], dimensions)
+            for doc, embedding in zip(batch, embeddings):
+                yield {
+                    "id": content_hash(doc),
+                    "content": doc["content"],
+                    "metadata": chunk_metadata(doc),
+                    "doc_category": doc["category"],
+                    "embedding": embedding,
+                }
+
+    manifest = write_store(path, rows(), dimensions=dimensions or 1536)
+    print(f"💾 Exported local vector store to {path}: {manifest['categories']}")
+    return manifest
+
 if __name__ == "__main__":
-    ingest_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed and load the Meridian knowledge base.")
+    parser.add_argument("--source-dir", metavar="PATH",
+                        help="Ingest .txt/.md/.pdf files under PATH (one sub-folder per category, "
+                             "e.g. PATH/technical/api_docs_v2.pdf) instead of the built-in documents.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Characters per chunk.")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="Characters shared by neighbouring chunks.")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="Processes extracting text.")
+    parser.add_argument("--default-category", help="doc_category for files directly under --source-dir.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Documents per embedding request / insert.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent embed+insert batches.")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Progress file used to resume a crashed run.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore any existing checkpoint.")
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks whose source is no longer present.")
+    parser.add_argument("--export-local", metavar="PATH", help="Also write a local NumPy vector store to PATH.")
+    parser.add_argument("--export-only", action="store_true", help="Skip the Supabase sync (use with --export-local).")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="Shortened embedding size for --export-local (e.g. 512). Supabase always stores "
+                             "1536 dims; its compact halfvec/binary indexes are derived in SQL.")
+    args = parser.parse_args()
+    try:
+        validate_chunking(args.chunk_size, args.chunk_overlap)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def source_documents() -> Iterable[dict]:
+        # A fresh generator per pass: chunks stream from disk straight into the
+        # embed/upsert batches, never holding the whole drop in memory.
+        if not args.source_dir:
+            return raw_documents
+        return load_directory(args.source_dir, chunk_size=args.chunk_size, overlap=args.chunk_overlap,
+                              workers=args.parse_workers, default_category=args.default_category)
+
+    if not args.export_only:
+        ingest_data(source_documents(), batch_size=args.batch_size, workers=args.workers,
+                    checkpoint_path=args.checkpoint, resume=not args.fresh, prune=not args.no_prune)
+    if args.export_local:
+        export_local_store(args.export_local, source_documents(), batch_size=args.batch_size,
+                           dimensions=args.dimensions)
@@ -0,0 +1,169 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# --- Loader Settings ---
+CHUNK_SIZE = int(os.getenv("MERIDIAN_CHUNK_SIZE", "1000"))  # characters per chunk
+CHUNK_OVERLAP = int(os.getenv("MERIDIAN_CHUNK_OVERLAP", "200"))
+PARSE_WORKERS = int(os.getenv("MERIDIAN_PARSE_WORKERS", str(os.cpu_count() or 2)))
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown"}
+PDF_EXTENSIONS = {".pdf"}
+# Text files above this size are streamed in the parent process block by block
+# instead of being chunked whole in a worker (keeps memory flat for huge files).
+STREAM_TEXT_BYTES = 16 * 1024 * 1024
+READ_BLOCK = 1024 * 1024
+
+
+def validate_chunking(chunk_size: int, overlap: int):
+    """
+    A chunk may end as early as chunk_size // 2 (on whitespace), so the overlap
+    must stay below that for every window to move the text forward.
+    """
+    if chunk_size < 2:
+        raise ValueError("chunk size must be at least 2 characters")
+    if not 0 <= overlap < chunk_size // 2:
+        raise ValueError(f"chunk overlap must be at least 0 and below half the chunk size "
+                         f"({chunk_size // 2}), got {overlap}")
+
+
+def chunk_text(segments: Iterable[str], chunk_size: int = CHUNK_SIZE,
+               overlap: int = CHUNK_OVERLAP) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (offset, chunk) windows over a stream of text segments. Chunks
+    end on whitespace where possible and consecutive chunks share ~`overlap`
+    characters. Only about one chunk of text is buffered at a time.
+    """
+    validate_chunking(chunk_size, overlap)
+
+    buffer, base = "", 0
+    for segment in segments:
+        buffer += segment
+        while len(buffer) > chunk_size:
+            cut = buffer.rfind(" ", chunk_size // 2, chunk_size)
+            if cut == -1:
+                cut = chunk_size
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield base, chunk
+
+            start = max(cut - overlap, 1)
+            boundary = buffer.find(" ", start, cut)  # start the overlap on a word
+            if boundary != -1:
+                start = boundary + 1
+            buffer = buffer[start:]
+            base += start
+
+    tail = buffer.strip()
+    if tail:
+        yield base, tail
+
+
+def _read_blocks(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(READ_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+def _pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+    # Imported lazily so pypdf is only required when PDFs are present
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ImportError("PDF support requires pypdf (pip install pypdf)") from None
+
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+def _chunk_file(path: str, source: str, category: str, chunk_size: int, overlap: int) -> Iterator[dict]:
+    if os.path.splitext(path)[1].lower() in PDF_EXTENSIONS:
+        pages = _pdf_pages(path)
+    else:
+        pages = [(None, _read_blocks(path))]
+
+    index = 0
+    for page, text in pages:
+        segments = [text] if isinstance(text, str) else text
+        for offset, chunk in chunk_text(segments, chunk_size, overlap):
+            metadata = {"offset": offset, "chunk": index}
+            if page is not None:
+                metadata["page"] = page
+            yield {"content": chunk, "source": source, "category": category, "metadata": metadata}
+            index += 1
+
+
+def parse_file(path: str, source: str, category: str, chunk_size: int = CHUNK_SIZE,
+               overlap: int = CHUNK_OVERLAP) -> List[dict]:
+    """
+    Extracts and chunks one file. Runs in a worker process; returns the
+    file's chunks ({content, source, category, metadata: {page, offset, chunk}}).
+    """
+    return list(_chunk_file(path, source, category, chunk_size, overlap))
+
+
+def iter_source_files(root: str, default_category: Optional[str] = None) -> Iterator[Tuple[str, str, str]]:
+    """
+    Walks `root` in a stable order and yields (path, source, category).
+    The first directory level is the doc_category (e.g. docs/technical/api.pdf);
+    files directly under `root` use `default_category` or are skipped.
+    """
+    extensions = TEXT_EXTENSIONS | PDF_EXTENSIONS
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            path = os.path.join(directory, name)
+            source = os.path.relpath(path, root)
+            parts = source.split(os.sep)
+            category = parts[0] if len(parts) > 1 else default_category
+            if not category:
+                print(f"⚠️ Skipping {source}: not in a category folder (use --default-category).")
+                continue
+            yield path, source, category
+
+
+def load_directory(root: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                   workers: int = PARSE_WORKERS, default_category: Optional[str] = None) -> Iterator[dict]:
+    """
+    Streams chunk documents for every supported file under `root`, in file
+    order, ready for ingest_data(). Files are parsed in a process pool with at
+    most 2 files per worker in flight, so memory is bounded by a handful of
+    files rather than the whole drop; very large text files are streamed.
+    A file that fails to parse is reported and skipped.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()  # (source, future), or (source, (path, category)) for streamed files
+        files = iter_source_files(root, default_category)
+
+        def submit_next() -> bool:
+            entry = next(files, None)
+            if entry is None:
+                return False
+            path, source, category = entry
+            is_text = os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS
+            if is_text and os.path.getsize(path) > STREAM_TEXT_BYTES:
+                pending.append((source, (path, category)))
+            else:
+                pending.append((source, pool.submit(parse_file, path, source, category, chunk_size, overlap)))
+            return True
+
+        while len(pending) < workers * 2 and submit_next():
+            pass
+
+        while pending:
+            source, work = pending.popleft()
+            try:
+                if isinstance(work, tuple):
+                    path, category = work
+                    yield from _chunk_file(path, source, category, chunk_size, overlap)
+                else:
+                    yield from work.result()
+            except Exception as e:
+                print(f"❌ Failed to parse {source}: {e}")
+            submit_next()
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence
+
+# --- Knowledge-Base Version ---
+# Ingestion bumps this marker file whenever it changes the corpus; the answer
+# cache compares it on every lookup (a single stat call) and drops all entries
+# produced against an older corpus.
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+KB_VERSION_PATH = os.getenv("MERIDIAN_KB_VERSION_FILE", os.path.join(PROJECT_ROOT, ".cache", "kb_version"))
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("MERIDIAN_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("MERIDIAN_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("MERIDIAN_ANSWER_CACHE_SIZE", "2048"))
+
+
+def read_kb_version(path: str = KB_VERSION_PATH) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "initial"
+
+
+def bump_kb_version(path: str = KB_VERSION_PATH) -> str:
+    """
+    Marks the corpus as changed. Called by ingestion after inserts or deletes.
+    """
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
+
+
+class _Bucket:
+    def __init__(self):
+        self.ids = []
+        self.vectors = []
+        self.matrix = None  # stacked lazily, reset when the bucket changes
+
+
+class SemanticAnswerCache:
+    """
+    Response cache keyed by (scope, intent, kb_version) and looked up by
+    query-embedding similarity. The scope is everything besides the question
+    that shapes the answer (persona text, conversation so far), so an answer
+    is never served to a different person or into a different conversation.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `maxsize`.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 maxsize: int = ANSWER_CACHE_SIZE, version_path: str = KB_VERSION_PATH):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.version_path = version_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # id -> (bucket_key, response, expires_at)
+        self._buckets = {}
+        self._version_mtime = None
+        self._version = "initial"
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def current_version(self) -> str:
+        """
+        Returns the corpus version, clearing the cache if ingestion bumped it.
+        """
+        try:
+            mtime = os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        if mtime != self._version_mtime:
+            with self._lock:
+                self._entries.clear()
+                self._buckets.clear()
+                self._version_mtime = mtime
+                self._version = read_kb_version(self.version_path)
+        return self._version
+
+    def _remove(self, entry_id: int):
+        bucket_key, _, _ = self._entries.pop(entry_id)
+        bucket = self._buckets[bucket_key]
+        index = bucket.ids.index(entry_id)
+        del bucket.ids[index]
+        del bucket.vectors[index]
+        bucket.matrix = None
+        if not bucket.ids:
+            del self._buckets[bucket_key]
+
+    def lookup(self, scope: Hashable, intent: str, query_embedding: Sequence[float]) -> Optional[str]:
+        import numpy as np
+
+        bucket_key = (scope, intent, self.current_version())
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                if bucket.matrix is None:
+                    bucket.matrix = np.stack(bucket.vectors)
+                scores = bucket.matrix @ query
+                best = int(scores.argmax())
+                entry_id = bucket.ids[best]
+                _, response, expires_at = self._entries[entry_id]
+
+                if expires_at < time.monotonic():
+                    self._remove(entry_id)
+                elif scores[best] >= self.threshold:
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return response
+
+            self.misses += 1
+            return None
+
+    def store(self, scope: Hashable, intent: str, query_embedding: Sequence[float], response: str):
+        import numpy as np
+
+        bucket_key = (scope, intent, self.current_version())
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        vector = vector / np.linalg.norm(vector)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket_key, response, time.monotonic() + self.ttl)
+            bucket = self._buckets.setdefault(bucket_key, _Bucket())
+            bucket.ids.append(entry_id)
+            bucket.vectors.append(vector)
+            bucket.matrix = None
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING
+
+# The SDKs take ~0.4 s to import, so they are loaded on first client creation
+# rather than at import time (keeps the app's first paint fast).
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+    from supabase import AsyncClient, Client
+
+# --- Pool Configuration ---
+# One registry per process: every component (and the ingestion script) asks for
+# clients here instead of calling create_client()/OpenAI() on each request, so
+# the HTTP session and its TLS connections are reused across pipeline runs.
+POOL_SIZE = int(os.getenv("MERIDIAN_HTTP_POOL_SIZE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("MERIDIAN_HTTP_KEEPALIVE_SECONDS", "60"))
+# Retries are owned by resilience.Endpoint (rate limits, backoff, circuit
+# breaker), so the SDK's own retry loop is disabled to avoid retrying twice.
+OPENAI_TIMEOUT = float(os.getenv("MERIDIAN_OPENAI_TIMEOUT", "30"))
+
+_lock = threading.Lock()
+_supabase_clients = {}
+_openai_clients = {}
+# Async clients hold connections bound to one event loop, so they are pooled per loop.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _openai_is_healthy(client) -> bool:
+    return not client.is_closed()
+
+
+def _supabase_is_healthy(client) -> bool:
+    # The PostgREST session is created lazily; an untouched client is healthy.
+    postgrest = getattr(client, "_postgrest", None)
+    if postgrest is None:
+        return True
+    return not postgrest.session.is_closed
+
+
+def _supabase_timeout() -> float:
+    # postgrest-py defaults to 120 s. A blocking request that outlives its
+    # endpoint deadline is abandoned by resilience.Endpoint.call(), so cap it
+    # at the longest Supabase deadline instead of letting it hold a worker.
+    from langflow_components.src.resilience import get_endpoint
+
+    return max(get_endpoint("supabase.rest").timeout, get_endpoint("supabase.rpc").timeout)
+
+
+def get_supabase_client(url: str, key: str) -> "Client":
+    """
+    Returns the shared Supabase client for (url, key), creating it on first use.
+    A client whose HTTP session has been closed is replaced transparently.
+    """
+    cache_key = (url, key)
+    with _lock:
+        client = _supabase_clients.get(cache_key)
+        if client is None or not _supabase_is_healthy(client):
+            from supabase import ClientOptions, create_client
+
+            client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=_supabase_timeout()))
+            _supabase_clients[cache_key] = client
+        return client
+
+
+def get_openai_client(api_key: str, base_url: str = None, pool_size: int = None) -> "OpenAI":
+    """
+    Returns the shared OpenAI client for (base_url, api_key).
+    The underlying httpx pool keeps connections alive between requests.
+    """
+    cache_key = (base_url or os.getenv("OPENAI_BASE_URL"), api_key)
+    with _lock:
+        client = _openai_clients.get(cache_key)
+        if client is None or not _openai_is_healthy(client):
+            from openai import DefaultHttpxClient, OpenAI
+
+            http_client = DefaultHttpxClient(limits=_limits(pool_size))
+            client = OpenAI(api_key=api_key, base_url=cache_key[0], http_client=http_client,
+                            max_retries=0, timeout=OPENAI_TIMEOUT)
+            _openai_clients[cache_key] = client
+        return client
+
+
+def _limits(pool_size: int = None) -> "httpx.Limits":
+    import httpx
+
+    size = pool_size or POOL_SIZE
+    return httpx.Limits(
+        max_connections=size,
+        max_keepalive_connections=size,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+async def get_async_supabase_client(url: str, key: str) -> "AsyncClient":
+    """
+    Async counterpart of get_supabase_client(), shared within the running event loop.
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    cache_key = ("supabase", url, key)
+    client = clients.get(cache_key)
+    if client is None or not _supabase_is_healthy(client):
+        from supabase import acreate_client
+
+        client = await acreate_client(url, key)
+        clients[cache_key] = client
+    return client
+
+
+def get_async_openai_client(api_key: str, base_url: str = None, pool_size: int = None) -> "AsyncOpenAI":
+    """
+    Async counterpart of get_openai_client(); must be called from inside a running loop.
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    cache_key = ("openai", base_url or os.getenv("OPENAI_BASE_URL"), api_key)
+    client = clients.get(cache_key)
+    if client is None or not _openai_is_healthy(client):
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        http_client = DefaultAsyncHttpxClient(limits=_limits(pool_size))
+        client = AsyncOpenAI(api_key=api_key, base_url=cache_key[1], http_client=http_client,
+                             max_retries=0, timeout=OPENAI_TIMEOUT)
+        clients[cache_key] = client
+    return client
+
+
+def reset_clients():
+    """
+    Closes and forgets every pooled client (e.g. after rotating keys).
+    """
+    with _lock:
+        for client in _openai_clients.values():
+            client.close()
+        for client in _supabase_clients.values():
+            postgrest = getattr(client, "_postgrest", None)
+            if postgrest is not None:
+                postgrest.session.close()
+        _openai_clients.clear()
+        _supabase_clients.clear()
@@ -1,9 +1,52 @@
 from langflow.custom import CustomComponent
 from langflow.io import MessageTextInput, Output
 from langflow.schema import Data
-from supabase import create_client, Client
+from langflow_components.src.clients import get_async_supabase_client, get_supabase_client
+from langflow_components.src.cache import TTLCache
+from langflow_components.src.resilience import get_endpoint
+from langflow_components.src.tracing import span
+from typing import TYPE_CHECKING, Iterable
 import os
 
+if TYPE_CHECKING:
+    from supabase import Client
+
+# --- Identity Cache ---
+# Profiles almost never change within a session, so the rendered persona is
+# cached per (supabase_url, user_id). Call ContextLoader.invalidate() after a
+# profile update to force a refetch on the next turn.
+CONTEXT_CACHE_SIZE = int(os.getenv("MERIDIAN_CONTEXT_CACHE_SIZE", "1024"))
+CONTEXT_CACHE_TTL = float(os.getenv("MERIDIAN_CONTEXT_CACHE_TTL", "900"))
+
+_context_cache = TTLCache(maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL)
+
+# Used when the profile cannot be fetched. The failure goes into "error" for
+# logs and tracing; it is never shown to the LLM as if it were a persona.
+FALLBACK_CONTEXT = (
+    "SYSTEM INSTRUCTION: The user's profile is currently unavailable. "
+    "Use a clear, professional tone suitable for a general business audience."
+)
+
+
+def fallback_context(error: str) -> dict:
+    return {"text": FALLBACK_CONTEXT, "role": None, "error": error}
+
+
+def render_context(profile: dict) -> dict:
+    """
+    Builds the persona instruction injected into the system prompt, plus the
+    role it was rendered for (used downstream, e.g. for cache eligibility).
+    """
+    # This is the "Magic" -> injecting the persona into the prompt
+    context_str = (
+        f"SYSTEM INSTRUCTION: You are speaking to {profile['full_name']}. "
+        f"Role: {profile['role']}. Industry: {profile['industry']}. "
+        f"Bio: {profile['bio']}. "
+        f"Adjust your tone and complexity accordingly."
+    )
+    return {"text": context_str, "role": profile["role"]}
+
+
 class ContextLoader(CustomComponent):
     display_name = "Meridian Context Loader"
     description = "Fetches User Profile from Supabase to inject persona-based context."
@@ -37,6 +80,7 @@ class ContextLoader(CustomComponent):
     def load_context(self) -> Data:
         """
         Connects to Supabase, fetches the user profile, and constructs a system prompt.
+        Served from the in-process identity cache when the profile was seen recently.
         """
         # 1. Setup Client
         url = self.supabase_url
@@ -46,28 +90,113 @@ class ContextLoader(CustomComponent):
         if not url or not key:
             return Data(data={"text": "System: Configuration Error. Missing API Keys."})
 
-        try:
-            supabase: Client = create_client(url, key)
-
-            # 2. Query Profile
-            response = supabase.table("profiles").select("*").eq("id", uid).execute()
-            
-            if not response.data:
-                return Data(data={"text": "System: User not found. Treat as generic user."})
-
-            profile = response.data[0]
-            
-            # 3. Construct Context String
-            # This is the "Magic" -> injecting the persona into the prompt
-            context_str = (
-                f"SYSTEM INSTRUCTION: You are speaking to {profile['full_name']}. "
-                f"Role: {profile['role']}. Industry: {profile['industry']}. "
-                f"Bio: {profile['bio']}. "
-                f"Adjust your tone and complexity accordingly."
-            )
-
-            # 4. Return as LangFlow Data Object
-            return Data(data={"text": context_str})
-
-        except Exception as e:
-            return Data(data={"text": f"System Error: Failed to load context. {str(e)}"})
\ No newline at end of file
+        with span("identity") as record:
+            cached = _context_cache.get((url, uid))
+            record["cache_hit"] = cached is not None
+            if cached is not None:
+                return Data(data=dict(cached))
+
+            try:
+                supabase: Client = get_supabase_client(url, key)
+
+                # 2. Query Profile
+                response = get_endpoint("supabase.rest").call(
+                    lambda: supabase.table("profiles").select("*").eq("id", uid).execute()
+                )
+
+                if not response.data:
+                    return Data(data={"text": "System: User not found. Treat as generic user."})
+
+                # 3. Construct Context String
+                context = render_context(response.data[0])
+                _context_cache.set((url, uid), context)
+
+                # 4. Return as LangFlow Data Object
+                return Data(data=dict(context))
+
+            except Exception as e:
+                record["error"] = str(e)
+                print(f"⚠️ Context load failed, using the generic persona: {e}")
+                return Data(data=fallback_context(str(e)))
+
+    async def aload_context(self) -> Data:
+        """
+        Async variant of load_context() for the concurrent pipeline.
+        """
+        url = self.supabase_url
+        key = self.supabase_key
+        uid = self.user_id
+
+        if not url or not key:
+            return Data(data={"text": "System: Configuration Error. Missing API Keys."})
+
+        with span("identity") as record:
+            cached = _context_cache.get((url, uid))
+            record["cache_hit"] = cached is not None
+            if cached is not None:
+                return Data(data=dict(cached))
+
+            try:
+                supabase = await get_async_supabase_client(url, key)
+                response = await get_endpoint("supabase.rest").acall(
+                    lambda: supabase.table("profiles").select("*").eq("id", uid).execute()
+                )
+
+                if not response.data:
+                    return Data(data={"text": "System: User not found. Treat as generic user."})
+
+                context = render_context(response.data[0])
+                _context_cache.set((url, uid), context)
+                return Data(data=dict(context))
+
+            except Exception as e:
+                record["error"] = str(e)
+                print(f"⚠️ Context load failed, using the generic persona: {e}")
+                return Data(data=fallback_context(str(e)))
+
+    def warm_up(self, user_ids: Iterable[str]) -> int:
+        """
+        Preloads the identity cache for many users with a single `in_` query.
+        Returns the number of profiles cached.
+        """
+        url = self.supabase_url
+        ids = [uid for uid in dict.fromkeys(user_ids) if _context_cache.get((url, uid)) is None]
+        if not ids:
+            return 0
+
+        supabase: Client = get_supabase_client(url, self.supabase_key)
+        response = get_endpoint("supabase.rest").call(
+            lambda: supabase.table("profiles").select("*").in_("id", ids).execute()
+        )
+
+        for profile in response.data:
+            _context_cache.set((url, profile["id"]), render_context(profile))
+        return len(response.data)
+
+    async def awarm_up(self, user_ids: Iterable[str]) -> int:
+        """
+        Async variant of warm_up(); also opens a connection in the loop's client pool.
+        """
+        url = self.supabase_url
+        ids = [uid for uid in dict.fromkeys(user_ids) if _context_cache.get((url, uid)) is None]
+        if not ids:
+            return 0
+
+        supabase = await get_async_supabase_client(url, self.supabase_key)
+        response = await get_endpoint("supabase.rest").acall(
+            lambda: supabase.table("profiles").select("*").in_("id", ids).execute()
+        )
+
+        for profile in response.data:
+            _context_cache.set((url, profile["id"]), render_context(profile))
+        return len(response.data)
+
+    @staticmethod
+    def invalidate(user_id: str = None):
+        """
+        Evicts a user's cached context (all users when user_id is None).
+        """
+        if user_id is None:
+            _context_cache.invalidate()
+        else:
+            _context_cache.invalidate_where(lambda cache_key: cache_key[1] == user_id)
@@ -0,0 +1,210 @@
+import array
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Sequence
+from langflow_components.src.cache import TTLCache
+from langflow_components.src.resilience import get_endpoint
+
+# --- Configuration ---
+# Tier 1 is an in-process LRU; tier 2 is a SQLite file shared by the app and the
+# ingestion script, so an embedding is paid for once per (text, model, dimensions).
+DEFAULT_MODEL = "text-embedding-3-small"
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_CACHE_PATH = os.getenv(
+    "MERIDIAN_EMBEDDING_CACHE", os.path.join(PROJECT_ROOT, ".cache", "embeddings.sqlite3")
+)
+MEMORY_CACHE_SIZE = int(os.getenv("MERIDIAN_EMBEDDING_MEMORY_SIZE", "4096"))
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: "What is the pricing?" and
+    "what is the  pricing" map to the same entry.
+    """
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def cache_key(text: str, model: str = DEFAULT_MODEL, dimensions: int = None) -> str:
+    raw = f"{model}|{dimensions or 0}|{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array.array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + on-disk SQLite) cache in front of embeddings.create.
+    Vectors are stored as float32 blobs keyed by normalized text, model and dimensions.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, memory_size: int = MEMORY_CACHE_SIZE):
+        self.path = path
+        self.memory = TTLCache(maxsize=memory_size)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.tokens_used = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute(
+            "create table if not exists embeddings ("
+            " key text primary key, model text not null, dimensions integer not null, vector blob not null)"
+        )
+        self._db.commit()
+
+    def _disk_get_many(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit for very large batches.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"select key, vector from embeddings where key in ({placeholders})", chunk
+                ).fetchall()
+                found.update({key: _unpack(blob) for key, blob in rows})
+        return found
+
+    def _disk_put_many(self, rows: List[tuple]):
+        with self._lock:
+            self._db.executemany(
+                "insert or replace into embeddings (key, model, dimensions, vector) values (?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+
+    def _memory_lookup(self, texts: Sequence[str], model: str, dimensions: int):
+        """
+        Tier 1 only. Returns (keys, vectors, pending) where `pending` lists the
+        distinct keys still to be looked up on disk.
+        """
+        keys = [cache_key(text, model, dimensions) for text in texts]
+        vectors = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                vectors[key] = vector
+        pending = [key for key in dict.fromkeys(keys) if key not in vectors]
+        return keys, vectors, pending
+
+    def _resolve(self, texts: Sequence[str], keys: List[str], vectors: dict, disk_found: dict) -> dict:
+        """
+        Merges the disk hits into `vectors`, promotes them to memory and returns
+        `missing`: each unresolved key mapped to its original text.
+        """
+        memory_hits = len(vectors)
+        for key, vector in disk_found.items():
+            self.memory.set(key, vector)
+        vectors.update(disk_found)
+
+        # Whatever is left goes to the API (deduplicated, original text preserved)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += len(disk_found)
+            self.misses += len(missing)
+        return missing
+
+    def _lookup(self, texts: Sequence[str], model: str, dimensions: int):
+        """
+        Resolves texts from the memory and disk tiers. Returns (keys, vectors, missing).
+        """
+        keys, vectors, pending = self._memory_lookup(texts, model, dimensions)
+        disk_found = self._disk_get_many(pending) if pending else {}
+        return keys, vectors, self._resolve(texts, keys, vectors, disk_found)
+
+    @staticmethod
+    def _request(missing: dict, model: str, dimensions: int) -> dict:
+        params = {"input": list(missing.values()), "model": model}
+        if dimensions:
+            params["dimensions"] = dimensions
+        return params
+
+    def _store(self, missing: dict, response, model: str, dimensions: int) -> dict:
+        fresh = dict(zip(missing.keys(), (item.embedding for item in sorted(response.data, key=lambda d: d.index))))
+        self._disk_put_many([(key, model, dimensions or 0, _pack(vector)) for key, vector in fresh.items()])
+        for key, vector in fresh.items():
+            self.memory.set(key, vector)
+        if getattr(response, "usage", None) is not None:
+            with self._lock:
+                self.tokens_used += response.usage.total_tokens
+        return fresh
+
+    def embed(self, client, texts: Sequence[str], model: str = DEFAULT_MODEL, dimensions: int = None) -> List[List[float]]:
+        """
+        Returns one embedding per text, calling the API once for all cache misses.
+        """
+        keys, vectors, missing = self._lookup(texts, model, dimensions)
+        if missing:
+            params = self._request(missing, model, dimensions)
+            response = get_endpoint("openai.embeddings").call(lambda: client.embeddings.create(**params))
+            vectors.update(self._store(missing, response, model, dimensions))
+        return [vectors[key] for key in keys]
+
+    async def aembed(self, client, texts: Sequence[str], model: str = DEFAULT_MODEL, dimensions: int = None) -> List[List[float]]:
+        """
+        Async variant of embed() for an AsyncOpenAI client. Memory hits are
+        served on the loop; SQLite reads and writes (blocking, and serialised
+        on the cache lock) run in a worker thread.
+        """
+        keys, vectors, pending = self._memory_lookup(texts, model, dimensions)
+        disk_found = await asyncio.to_thread(self._disk_get_many, pending) if pending else {}
+        missing = self._resolve(texts, keys, vectors, disk_found)
+        if missing:
+            params = self._request(missing, model, dimensions)
+            response = await get_endpoint("openai.embeddings").acall(lambda: client.embeddings.create(**params))
+            vectors.update(await asyncio.to_thread(self._store, missing, response, model, dimensions))
+        return [vectors[key] for key in keys]
+
+    def embed_one(self, client, text: str, model: str = DEFAULT_MODEL, dimensions: int = None) -> List[float]:
+        return self.embed(client, [text], model, dimensions)[0]
+
+    async def aembed_one(self, client, text: str, model: str = DEFAULT_MODEL, dimensions: int = None) -> List[float]:
+        return (await self.aembed(client, [text], model, dimensions))[0]
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "tokens_used": self.tokens_used,
+            "memory_size": len(self.memory),
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(path: str = None) -> EmbeddingCache:
+    """
+    Returns the process-wide cache for a given file (default: MERIDIAN_EMBEDDING_CACHE).
+    """
+    path = os.path.abspath(path or DEFAULT_CACHE_PATH)
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(path)
+        return _caches[path]
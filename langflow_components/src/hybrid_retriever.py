@@ -1,10 +1,40 @@
 from langflow.custom import CustomComponent
 from langflow.io import MessageTextInput, IntInput, Output
 from langflow.schema import Data
-from supabase import create_client, Client
-from openai import OpenAI
+from langflow_components.src.clients import (
+    get_async_openai_client,
+    get_async_supabase_client,
+    get_openai_client,
+    get_supabase_client,
+)
+from langflow_components.src.cache import TTLCache
+from langflow_components.src.embedding_cache import get_embedding_cache
+from langflow_components.src.resilience import get_endpoint
+from langflow_components.src.tracing import span
+from typing import TYPE_CHECKING, List, Sequence
+import asyncio
 import os
 
+if TYPE_CHECKING:
+    from supabase import Client
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+MATCH_THRESHOLD = 0.01  # <--- CRITICAL FIX: Accepts almost any match
+RRF_K = 50  # reciprocal rank fusion constant (hybrid mode)
+# --- Corpus Categories ---
+# "general" (no clear intent) searches every doc_category in the corpus. The
+# list comes from MERIDIAN_CATEGORIES when set, otherwise from the corpus
+# itself (local store manifest, or the document_categories RPC cached for
+# MERIDIAN_CATEGORY_CACHE_TTL seconds). DEFAULT_CATEGORIES is the last resort.
+CONFIGURED_CATEGORIES = [name.strip() for name in os.getenv("MERIDIAN_CATEGORIES", "").split(",") if name.strip()]
+CATEGORY_CACHE_TTL = float(os.getenv("MERIDIAN_CATEGORY_CACHE_TTL", "600"))
+DEFAULT_CATEGORIES = ["technical", "business"]
+
+_category_cache = TTLCache(maxsize=16, ttl=CATEGORY_CACHE_TTL)
+_reported_downgrades = set()
+# Shown in place of the documents when retrieval fails; the cause goes into "error"
+RETRIEVAL_UNAVAILABLE = "The internal knowledge base is temporarily unavailable."
+
 class HybridRetriever(CustomComponent):
     display_name = "Meridian Hybrid Retriever"
     description = "Vector Search with Metadata Filtering based on Intent."
@@ -13,54 +43,359 @@ class HybridRetriever(CustomComponent):
     inputs = [
         MessageTextInput(name="search_query", display_name="Search Query"),
         MessageTextInput(name="filter_category", display_name="Filter Category"),
+        MessageTextInput(
+            name="filter_categories",
+            display_name="Filter Categories",
+            value="",
+            info="Comma-separated doc_category list (overrides Filter Category). "
+                 "Empty or 'general' searches every category in one RPC.",
+        ),
         MessageTextInput(name="openai_api_key", display_name="OpenAI API Key", required=True),
         MessageTextInput(name="supabase_url", display_name="Supabase URL", required=True),
         MessageTextInput(name="supabase_key", display_name="Supabase Service Key", required=True),
-        IntInput(name="k", display_name="Top K Results", value=3)
+        IntInput(name="k", display_name="Top K Results", value=3),
+        IntInput(name="per_category_k", display_name="Per-Category Quota", value=0),
+        IntInput(name="ef_search", display_name="HNSW ef_search", value=40),
+        IntInput(name="probes", display_name="IVFFlat Probes", value=10),
+        MessageTextInput(
+            name="backend",
+            display_name="Vector Backend",
+            value="supabase",
+            info="'supabase' (match_documents RPC) or 'local' (in-process NumPy store).",
+        ),
+        MessageTextInput(
+            name="search_mode",
+            display_name="Search Mode",
+            value="vector",
+            info="'vector' (match_documents) or 'hybrid' (full-text + vector fused with RRF, supabase backend).",
+        ),
+        MessageTextInput(
+            name="storage",
+            display_name="Vector Storage",
+            value="full",
+            info="'full' (float32), 'halfvec' (512-dim half precision) or 'binary' (sign bits): "
+                 "compact modes search coarsely, then re-rank k * Re-rank Factor candidates at full precision.",
+        ),
+        IntInput(name="rerank_factor", display_name="Re-rank Factor", value=4),
+        MessageTextInput(
+            name="local_store_path",
+            display_name="Local Store Path",
+            value="",
+            info="Directory exported by `ingest_docs.py --export-local` (local backend only).",
+        ),
     ]
 
     outputs = [
         Output(display_name="Retrieved Docs", name="retrieved_docs", method="search_vectors"),
     ]
 
-    def search_vectors(self) -> Data:
-        if not self.openai_api_key or not self.supabase_url:
-            return Data(data={"text": "Configuration Error."})
+    def _option(self, name: str):
+        """
+        Input value, falling back to the declared default when run outside LangFlow.
+        """
+        if hasattr(self, name):
+            return getattr(self, name)
+        return next(field.value for field in self.inputs if field.name == name)
 
-        try:
-            openai_client = OpenAI(api_key=self.openai_api_key)
-            supabase: Client = create_client(self.supabase_url, self.supabase_key)
+    def _dimensions(self):
+        """
+        Query embedding size: whatever the local store was exported with
+        (`--dimensions`), otherwise the model's full 1536.
+        """
+        if self._option("backend") != "local":
+            return None
+        from langflow_components.src.local_vector_store import get_local_store
 
-            # Generate Embedding
-            emb_response = openai_client.embeddings.create(
-                input=self.search_query,
-                model="text-embedding-3-small"
-            )
-            query_embedding = emb_response.data[0].embedding
+        dimensions = get_local_store(self._option("local_store_path")).dimensions
+        return None if dimensions == 1536 else dimensions
+
+    def embed_query(self) -> List[float]:
+        # Repeated queries are served from the embedding cache
+        with span("embed"):
+            openai_client = get_openai_client(self.openai_api_key)
+            return get_embedding_cache().embed_one(openai_client, self.search_query, model=EMBEDDING_MODEL,
+                                                   dimensions=self._dimensions())
+
+    async def aembed_query(self) -> List[float]:
+        with span("embed"):
+            openai_client = get_async_openai_client(self.openai_api_key)
+            return await get_embedding_cache().aembed_one(openai_client, self.search_query, model=EMBEDDING_MODEL,
+                                                          dimensions=self._dimensions())
+
+    def corpus_categories(self) -> List[str]:
+        """
+        Every doc_category in the corpus (see Corpus Categories above).
+        """
+        if CONFIGURED_CATEGORIES:
+            return list(CONFIGURED_CATEGORIES)
+        if self._option("backend") == "local":
+            from langflow_components.src.local_vector_store import get_local_store
+
+            return get_local_store(self._option("local_store_path")).categories
+
+        cached = _category_cache.get(self.supabase_url)
+        if cached is None:
+            try:
+                supabase: Client = get_supabase_client(self.supabase_url, self.supabase_key)
+                rows = get_endpoint("supabase.rpc").call(
+                    lambda: supabase.rpc("document_categories", {}).execute()
+                ).data
+                cached = [row["doc_category"] for row in rows]
+            except Exception as e:
+                # Cached as well, so a missing migration costs one RPC per TTL, not one per turn
+                print(f"⚠️ Category discovery failed, using {DEFAULT_CATEGORIES}: {e}")
+                cached = list(DEFAULT_CATEGORIES)
+            _category_cache.set(self.supabase_url, cached)
+        return list(cached)
+
+    def categories(self) -> List[str]:
+        """
+        doc_category values to search. The router's "general" (and an empty
+        filter) maps to every category instead of matching nothing.
+        """
+        raw = self._option("filter_categories") or getattr(self, "filter_category", None) or ""
+        names = [name.strip() for name in raw.split(",") if name.strip()]
+        if not names or "general" in names:
+            return self.corpus_categories()
+        return names
+
+    def _multi_downgrades(self) -> str:
+        """
+        Options the multi-category path cannot honour: match_documents_multi
+        is a plain vector search over full-precision embeddings, and the local
+        store has no full-text index. Returned as "option=value, ..." ("" if none).
+        """
+        ignored = []
+        if self._option("search_mode") != "vector":
+            ignored.append(f"search_mode={self._option('search_mode')}")
+        if self._option("backend") != "local" and self._option("storage") != "full":
+            ignored.append(f"storage={self._option('storage')}")
+        downgrade = ", ".join(ignored)
+        if downgrade and downgrade not in _reported_downgrades:
+            _reported_downgrades.add(downgrade)
+            print(f"⚠️ RETRIEVER: {downgrade} not supported across several categories, "
+                  f"using full-precision vector search")
+        return downgrade
 
-            # Execute RPC with Relaxed Threshold
-            rpc_params = {
+    def _match_local(self, query_embeddings: Sequence[List[float]]) -> List[List[dict]]:
+        # Imported lazily so NumPy is only required for the local backend
+        from langflow_components.src.local_vector_store import get_local_store
+
+        store = get_local_store(self._option("local_store_path"))
+        return store.search_batch(query_embeddings, k=self.k, category=self.categories(),
+                                  threshold=MATCH_THRESHOLD, storage=self._option("storage"),
+                                  rerank_factor=self._option("rerank_factor"),
+                                  per_category_k=self._option("per_category_k") or None)
+
+    def _multi_rpc_params(self, query_embeddings: Sequence[List[float]]) -> dict:
+        return {
+            "query_embeddings": list(query_embeddings),
+            "match_threshold": MATCH_THRESHOLD,
+            "match_count": self.k,
+            "filter_categories": self.categories(),
+            "per_category_count": self._option("per_category_k") or None,
+            "ef_search": self._option("ef_search"),
+        }
+
+    @staticmethod
+    def _group_by_query(rows: List[dict], count: int) -> List[List[dict]]:
+        results = [[] for _ in range(count)]
+        for row in rows:
+            results[row.pop("query_index")].append(row)
+        return results
+
+    def _rpc(self, query_embedding: List[float]):
+        """
+        (function name, params) for the configured search mode (single category).
+        """
+        category = self.categories()[0]
+        if self._option("search_mode") == "hybrid":
+            # One round trip: keyword and vector rankings are fused server-side
+            return "hybrid_match_documents", {
+                "query_text": self.search_query,
+                "query_embedding": query_embedding,
+                "match_count": self.k,
+                "filter_category": category,
+                "rrf_k": RRF_K,
+                "ef_search": self._option("ef_search"),
+            }
+
+        if self._option("storage") != "full":
+            # Coarse search on the halfvec/binary index, exact re-rank of k * factor rows
+            return "match_documents_compact", {
                 "query_embedding": query_embedding,
-                "match_threshold": 0.01,  # <--- CRITICAL FIX: Accepts almost any match
+                "match_threshold": MATCH_THRESHOLD,
                 "match_count": self.k,
-                "filter_category": self.filter_category
+                "filter_category": category,
+                "storage": self._option("storage"),
+                "rerank_factor": self._option("rerank_factor"),
+                "ef_search": self._option("ef_search"),
             }
 
-            print(f"🔍 RETRIEVER DEBUG: Searching for '{self.filter_category}' docs...")
-            response = supabase.rpc("match_documents", rpc_params).execute()
-            
+        # Execute RPC with Relaxed Threshold
+        return "match_documents", {
+            "query_embedding": query_embedding,
+            "match_threshold": MATCH_THRESHOLD,
+            "match_count": self.k,
+            "filter_category": category,
+            "ef_search": self._option("ef_search"),  # recall/latency knob for the HNSW index
+            "probes": self._option("probes"),
+        }
+
+    def match(self, query_embedding: List[float]) -> List[dict]:
+        """
+        Top-k rows (id, content, metadata, doc_category, similarity) from the
+        configured backend; hybrid mode adds keyword_rank, semantic_rank and
+        the fused score (rows come back ordered by it). Several categories go
+        through match_batch() (vector search over full-precision embeddings;
+        the ignored options are logged and recorded on the trace).
+        """
+        if self._option("backend") == "local" or len(self.categories()) > 1:
+            return self.match_batch([query_embedding])[0]
+
+        with span("vector_search", backend=self._option("backend"), mode=self._option("search_mode"),
+                  storage=self._option("storage")) as record:
+            supabase: Client = get_supabase_client(self.supabase_url, self.supabase_key)
+            matches = get_endpoint("supabase.rpc").call(
+                lambda: supabase.rpc(*self._rpc(query_embedding)).execute()
+            ).data
+            record["results"] = len(matches)
+            return matches
+
+    async def amatch(self, query_embedding: List[float]) -> List[dict]:
+        # Category discovery may take a (cached) RPC: resolve it off the event loop
+        if self._option("backend") == "local" or len(await asyncio.to_thread(self.categories)) > 1:
+            return (await self.amatch_batch([query_embedding]))[0]
+
+        with span("vector_search", backend=self._option("backend"), mode=self._option("search_mode"),
+                  storage=self._option("storage")) as record:
+            supabase = await get_async_supabase_client(self.supabase_url, self.supabase_key)
+            response = await get_endpoint("supabase.rpc").acall(
+                lambda: supabase.rpc(*self._rpc(query_embedding)).execute()
+            )
+            matches = response.data
+            record["results"] = len(matches)
+            return matches
+
+    def match_batch(self, query_embeddings: Sequence[List[float]]) -> List[List[dict]]:
+        """
+        Per-query top-k over all of categories() for a batch of embeddings,
+        in one match_documents_multi call (or one local matmul).
+        """
+        with span("vector_search", backend=self._option("backend"), mode="multi",
+                  storage=self._option("storage"), queries=len(query_embeddings)) as record:
+            downgrade = self._multi_downgrades()
+            if downgrade:
+                record["ignored"] = downgrade
+            if self._option("backend") == "local":
+                results = self._match_local(query_embeddings)
+            else:
+                supabase: Client = get_supabase_client(self.supabase_url, self.supabase_key)
+                params = self._multi_rpc_params(query_embeddings)
+                rows = get_endpoint("supabase.rpc").call(
+                    lambda: supabase.rpc("match_documents_multi", params).execute()
+                ).data
+                results = self._group_by_query(rows, len(query_embeddings))
+            record["results"] = sum(len(matches) for matches in results)
+            return results
+
+    async def amatch_batch(self, query_embeddings: Sequence[List[float]]) -> List[List[dict]]:
+        with span("vector_search", backend=self._option("backend"), mode="multi",
+                  storage=self._option("storage"), queries=len(query_embeddings)) as record:
+            downgrade = self._multi_downgrades()
+            if downgrade:
+                record["ignored"] = downgrade
+            if self._option("backend") == "local":
+                # NumPy releases the GIL in the matmul, so a worker thread keeps the loop responsive
+                results = await asyncio.to_thread(self._match_local, query_embeddings)
+            else:
+                supabase = await get_async_supabase_client(self.supabase_url, self.supabase_key)
+                params = await asyncio.to_thread(self._multi_rpc_params, query_embeddings)
+                response = await get_endpoint("supabase.rpc").acall(
+                    lambda: supabase.rpc("match_documents_multi", params).execute()
+                )
+                results = self._group_by_query(response.data, len(query_embeddings))
+            record["results"] = sum(len(matches) for matches in results)
+            return results
+
+    @staticmethod
+    def format_results(matches: List[dict]) -> str:
+        results_text = ""
+        for doc in matches:
+            results_text += f"\n[Source: {doc['doc_category'].upper()}] {doc['content']}\n"
+
+        if not results_text:
+            results_text = "No relevant internal documents found for this category."
+        return results_text
+
+    def search_vectors(self) -> Data:
+        local = self._option("backend") == "local"
+        if not self.openai_api_key or not (self.supabase_url or local):
+            return Data(data={"text": "Configuration Error.", "error": "configuration"})
+
+        try:
+            query_embedding = self.embed_query()
+
+            print(f"🔍 RETRIEVER DEBUG: Searching for {self.categories()} docs...")
+            matches = self.match(query_embedding)
+
             # Debug: Did we find anything?
-            print(f"✅ RETRIEVER FOUND: {len(response.data)} documents.")
+            print(f"✅ RETRIEVER FOUND: {len(matches)} documents.")
+
+            # `documents` keeps the structured rows for budgeted prompt assembly
+            return Data(data={"text": self.format_results(matches), "documents": matches})
 
-            results_text = ""
-            for doc in response.data:
-                results_text += f"\n[Source: {doc['doc_category'].upper()}] {doc['content']}\n"
+        except Exception as e:
+            print(f"❌ RETRIEVER ERROR: {e}")
+            return Data(data={"text": RETRIEVAL_UNAVAILABLE, "error": str(e)})
+
+    async def asearch_vectors(self, query_embedding: List[float] = None) -> Data:
+        """
+        Async variant of search_vectors(). Pass a precomputed `query_embedding`
+        when the caller already embedded the query concurrently with other work.
+        """
+        local = self._option("backend") == "local"
+        if not self.openai_api_key or not (self.supabase_url or local):
+            return Data(data={"text": "Configuration Error.", "error": "configuration"})
+
+        try:
+            if query_embedding is None:
+                query_embedding = await self.aembed_query()
+
+            categories = await asyncio.to_thread(self.categories)  # may discover them over RPC
+            print(f"🔍 RETRIEVER DEBUG: Searching for {categories} docs...")
+            matches = await self.amatch(query_embedding)
+            print(f"✅ RETRIEVER FOUND: {len(matches)} documents.")
 
-            if not results_text:
-                results_text = "No relevant internal documents found for this category."
+            return Data(data={"text": self.format_results(matches), "documents": matches})
+
+        except Exception as e:
+            print(f"❌ RETRIEVER ERROR: {e}")
+            return Data(data={"text": RETRIEVAL_UNAVAILABLE, "error": str(e)})
+
+    async def asearch_vectors_batch(self, queries: Sequence[str],
+                                    query_embeddings: Sequence[List[float]] = None) -> List[Data]:
+        """
+        One Data per query (same shape as search_vectors()) for a batch of
+        questions, e.g. the parts of a multi-part question: one embedding
+        request for the cache misses and one retrieval RPC for the whole batch.
+        """
+        local = self._option("backend") == "local"
+        if not self.openai_api_key or not (self.supabase_url or local):
+            return [Data(data={"text": "Configuration Error.", "error": "configuration"}) for _ in queries]
+
+        try:
+            if query_embeddings is None:
+                with span("embed", queries=len(queries)):
+                    openai_client = get_async_openai_client(self.openai_api_key)
+                    query_embeddings = await get_embedding_cache().aembed(
+                        openai_client, list(queries), model=EMBEDDING_MODEL, dimensions=self._dimensions())
 
-            return Data(data={"text": results_text})
+            categories = await asyncio.to_thread(self.categories)
+            print(f"🔍 RETRIEVER DEBUG: Batch of {len(queries)} queries over {categories} docs...")
+            results = await self.amatch_batch(query_embeddings)
+            return [Data(data={"text": self.format_results(matches), "documents": matches}) for matches in results]
 
         except Exception as e:
             print(f"❌ RETRIEVER ERROR: {e}")
-            return Data(data={"text": f"Retrieval Error: {str(e)}"})
\ No newline at end of file
+            return [Data(data={"text": RETRIEVAL_UNAVAILABLE, "error": str(e)}) for _ in queries]
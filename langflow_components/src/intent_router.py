@@ -1,6 +1,91 @@
 from langflow.custom import CustomComponent
 from langflow.io import MessageTextInput, Output
 from langflow.schema import Data
+from langflow_components.src.tracing import span
+from typing import Callable, Dict, List, Sequence
+import re
+
+# 1. Expanded Keywords (regex fragments, matched on word boundaries so that
+#    "key" no longer fires on "monkey" nor "api" on "capital")
+TECH_KEYWORDS = [
+    r"apis?", r"python", r"cod(?:e|es|ing)", r"websockets?", r"databases?", r"schemas?",
+    r"tokens?", r"o?auth(?:entication|enticate[ds]?|enticating|orization|orize[ds]?|orizing)?",
+    r"keys?", r"connect\w*", r"integrat\w*", r"endpoints?", r"sdks?",
+]
+BIZ_KEYWORDS = [
+    r"pric(?:e|es|ed|ing)", r"costs?", r"how\s+much", r"roi", r"competitors?", r"competitive",
+    r"markets?", r"revenue", r"value", r"sales", r"licens\w*", r"subscriptions?",
+    r"business\w*", r"strateg\w*",
+]
+
+# One compiled pass per query; the named group tells which list matched
+_KEYWORD_PATTERN = re.compile(
+    r"\b(?:(?P<technical>" + "|".join(TECH_KEYWORDS) + r")|(?P<business>" + "|".join(BIZ_KEYWORDS) + r"))\b",
+    re.IGNORECASE,
+)
+
+# Greetings, thanks and other pleasantries: answered without retrieval. The
+# whole message must consist of these phrases, so "hi, what is the pricing?"
+# still goes through the knowledge base.
+SMALL_TALK_PHRASES = [
+    r"h(?:i|ello|ey|iya)(?:\s+there)?", r"good\s+(?:morning|afternoon|evening)", r"greetings",
+    r"thanks?(?:\s+you)?(?:\s+(?:so|very)\s+much)?", r"thank\s+you(?:\s+(?:so|very)\s+much)?", r"thx",
+    r"cheers", r"(?:good)?bye", r"see\s+you", r"how\s+are\s+you(?:\s+doing)?(?:\s+today)?",
+    r"who\s+are\s+you", r"what\s+can\s+you\s+do",
+]
+# Acknowledgements are small talk only when closing a topic: right after the
+# assistant asked something ("Want the enterprise pricing?"), "ok" means yes.
+ACKNOWLEDGEMENT_PHRASES = [r"ok(?:ay)?", r"cool", r"great", r"nice", r"perfect", r"got\s+it"]
+
+
+def _phrase_pattern(phrases: List[str]):
+    return re.compile(r"^(?:\s*(?:" + "|".join(phrases) + r")\b[\s!?.,:)]*)+$", re.IGNORECASE)
+
+
+_SMALL_TALK_PATTERN = _phrase_pattern(SMALL_TALK_PHRASES + ACKNOWLEDGEMENT_PHRASES)
+_SOCIAL_PATTERN = _phrase_pattern(SMALL_TALK_PHRASES)
+
+# --- Centroid Mode ---
+# Prototype questions per category; their mean embedding is the category centroid.
+CENTROID_EXAMPLES = {
+    "technical": [
+        "How do I authenticate against the API?",
+        "How do I connect to the websocket stream?",
+        "What database schema and sharding setup do you recommend?",
+        "Which SDK endpoints do I need to integrate?",
+    ],
+    "business": [
+        "What is the pricing?",
+        "What ROI and revenue impact can we expect?",
+        "How do you compare to competitors in the market?",
+        "How does licensing and the subscription model work?",
+    ],
+}
+MIN_CENTROID_SIMILARITY = 0.2  # below this the query is treated as "general"
+
+_centroid_labels: List[str] = []
+_centroid_matrix = None
+
+
+def classify_keywords(query: str) -> str:
+    # 2. Logic (technical wins when both lists match, as before)
+    found = {match.lastgroup for match in _KEYWORD_PATTERN.finditer(query)}
+    if "technical" in found:
+        return "technical"
+    if "business" in found:
+        return "business"
+    return "general"
+
+
+def is_small_talk(query: str, previous_response: str = None) -> bool:
+    """
+    `previous_response` is the assistant's last message, if any: after a
+    question, acknowledgements are answers that need the knowledge base.
+    """
+    if previous_response and previous_response.rstrip().endswith("?"):
+        return bool(_SOCIAL_PATTERN.match(query))
+    return bool(_SMALL_TALK_PATTERN.match(query))
+
 
 class IntentRouter(CustomComponent):
     display_name = "Meridian Intent Router"
@@ -13,35 +98,117 @@ class IntentRouter(CustomComponent):
             display_name="User Query",
             info="The question asked by the user."
         ),
+        MessageTextInput(
+            name="mode",
+            display_name="Routing Mode",
+            value="keyword",
+            info="'keyword' (compiled word-boundary match) or 'centroid' (embedding similarity).",
+        ),
     ]
 
     outputs = [
         Output(display_name="Intent Category", name="intent", method="route_intent"),
     ]
 
+    # Optional: the query embedding the retriever already computed (centroid mode)
+    query_embedding = None
+    # Optional: the assistant's previous message (tells an "ok" answer from a closing "ok")
+    previous_response = None
+
+    def needs_retrieval(self) -> bool:
+        """
+        Small talk needs neither documents nor the large model. Cheap and
+        embedding-free, so callers can run it before embedding the query.
+        """
+        return not is_small_talk(self.user_query, self.previous_response)
+
     def route_intent(self) -> Data:
         query = self.user_query.lower()
-        
-        # 1. Expanded Keywords
-        tech_keywords = [
-            "api", "python", "code", "websocket", "database", "schema", 
-            "token", "auth", "key", "connect", "integrate", "endpoint", "sdk"
-        ]
-        biz_keywords = [
-            "price", "pricing", "cost", "how much", "roi", "competitor", 
-            "market", "revenue", "value", "sales", "license", "subscription",
-            "business", "strategy"
-        ]
+        mode = getattr(self, "mode", "keyword")
 
-        # 2. Logic (Prioritize Business if ambiguous keywords like 'value' appear)
-        intent = "general" 
-        
-        if any(word in query for word in tech_keywords):
-            intent = "technical"
-        elif any(word in query for word in biz_keywords):
-            intent = "business"
+        with span("intent", mode=mode) as record:
+            intent = None
+            if mode == "centroid" and self.query_embedding is not None and self.has_centroids():
+                try:
+                    intent = self.classify_embeddings([self.query_embedding])[0]
+                except Exception as e:
+                    # e.g. centroids of another embedding size: keywords still route the turn
+                    record["error"] = str(e)
+                    print(f"⚠️ Centroid routing failed, using keywords: {e}")
+            if intent is None:
+                record["mode"] = "keyword"
+                intent = classify_keywords(query)
+            record["intent"] = intent
+
+            needs_retrieval = self.needs_retrieval()
+            record["needs_retrieval"] = needs_retrieval
 
         # Debug Print to Console
-        print(f"🔀 ROUTER DEBUG: Query='{query}' -> Intent='{intent}'")
+        print(f"🔀 ROUTER DEBUG: Query='{query}' -> Intent='{intent}' ({record['mode']})")
+
+        return Data(data={"text": intent, "needs_retrieval": needs_retrieval})
+
+    async def aroute_intent(self) -> Data:
+        """
+        Async entry point for the concurrent pipeline. Routing is pure CPU work
+        (no I/O), so it runs inline on the event loop.
+        """
+        return self.route_intent()
+
+    @staticmethod
+    def route_batch(queries: Sequence[str], query_embeddings: Sequence[Sequence[float]] = None) -> List[str]:
+        """
+        Classifies many queries at once. With embeddings (and centroids loaded)
+        the whole batch is scored with a single matrix product.
+        """
+        if query_embeddings is not None and IntentRouter.has_centroids():
+            return IntentRouter.classify_embeddings(query_embeddings)
+        return [classify_keywords(query) for query in queries]
 
-        return Data(data={"text": intent})
\ No newline at end of file
+    @staticmethod
+    def has_centroids() -> bool:
+        return _centroid_matrix is not None
+
+    @staticmethod
+    def set_centroids(centroids: Dict[str, Sequence[float]]):
+        """
+        Installs per-category centroid embeddings (e.g. category means from the corpus).
+        """
+        import numpy as np
+
+        global _centroid_labels, _centroid_matrix
+        matrix = np.asarray(list(centroids.values()), dtype=np.float32)
+        _centroid_matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        _centroid_labels = list(centroids)
+
+    @staticmethod
+    def build_centroids(embed: Callable[[List[str]], List[List[float]]], examples: Dict[str, List[str]] = None):
+        """
+        Computes centroids from prototype questions with one batched `embed` call
+        (pass the shared embedding cache, so this is free after the first run).
+        """
+        import numpy as np
+
+        examples = examples or CENTROID_EXAMPLES
+        texts = [text for category in examples for text in examples[category]]
+        vectors = np.asarray(embed(texts), dtype=np.float32)
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        centroids, start = {}, 0
+        for category, prototypes in examples.items():
+            centroids[category] = vectors[start:start + len(prototypes)].mean(axis=0)
+            start += len(prototypes)
+        IntentRouter.set_centroids(centroids)
+
+    @staticmethod
+    def classify_embeddings(query_embeddings: Sequence[Sequence[float]]) -> List[str]:
+        import numpy as np
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ _centroid_matrix.T
+        best = scores.argmax(axis=1)
+        return [
+            _centroid_labels[column] if scores[row, column] >= MIN_CENTROID_SIMILARITY else "general"
+            for row, column in enumerate(best)
+        ]
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+from typing import Iterable, List, Sequence, Union
+import numpy as np
+
+# --- On-disk Layout ---
+# <store>/manifest.json        {"dimensions": 1536, "categories": {"technical": 3, ...}}
+# <store>/<category>.f32       row-major float32 matrix, rows L2-normalized
+# <store>/<category>.jsonl     one {"id", "content", "metadata", "doc_category"} per row
+MANIFEST = "manifest.json"
+
+# --- Compact Coarse Search ---
+# "halfvec": cosine over the first COMPACT_DIMENSIONS dims (Matryoshka prefix;
+#            kept as float32 in memory because NumPy has no fast float16 matmul)
+# "binary":  Hamming distance over sign bits, popcounted 16 bits at a time
+# Both pick rerank_factor * k candidates, then re-rank them on the full rows.
+COMPACT_DIMENSIONS = 512
+STORAGE_MODES = ("full", "halfvec", "binary")
+_POPCOUNT_8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_POPCOUNT_16 = (_POPCOUNT_8[:, None] + _POPCOUNT_8[None, :]).reshape(-1)
+
+
+def _sign_bits(matrix: np.ndarray) -> np.ndarray:
+    """
+    Sign bits of each row packed into uint16 words (zero-padded to whole words).
+    """
+    bits = np.packbits(matrix > 0, axis=-1)
+    if bits.shape[-1] % 2:
+        bits = np.pad(bits, [(0, 0)] * (bits.ndim - 1) + [(0, 1)])
+    return np.ascontiguousarray(bits).view(np.uint16)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column indices of the k highest scores per row (unordered).
+    """
+    count = scores.shape[1]
+    if k < count:
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.broadcast_to(np.arange(count), (scores.shape[0], count))
+
+
+def write_store(path: str, rows: Iterable[dict], dimensions: int = 1536) -> dict:
+    """
+    Streams rows ({content, metadata, doc_category, embedding[, id]}) into the
+    local format, one partition per doc_category. Returns the manifest.
+    """
+    os.makedirs(path, exist_ok=True)
+    counts = {}
+    handles = {}
+    try:
+        for row in rows:
+            category = row["doc_category"]
+            if category not in handles:
+                handles[category] = (
+                    open(os.path.join(path, f"{category}.f32.tmp"), "wb"),
+                    open(os.path.join(path, f"{category}.jsonl.tmp"), "w"),
+                )
+                counts[category] = 0
+            vectors, records = handles[category]
+
+            vector = _normalize(np.asarray(row["embedding"], dtype=np.float32).reshape(1, dimensions))
+            vectors.write(vector.tobytes())
+            records.write(json.dumps({
+                "id": row.get("id", counts[category]),
+                "content": row["content"],
+                "metadata": row.get("metadata", {}),
+                "doc_category": category,
+            }) + "\n")
+            counts[category] += 1
+    finally:
+        for vectors, records in handles.values():
+            vectors.close()
+            records.close()
+
+    for category in counts:
+        for suffix in ("f32", "jsonl"):
+            os.replace(os.path.join(path, f"{category}.{suffix}.tmp"), os.path.join(path, f"{category}.{suffix}"))
+
+    manifest = {"dimensions": dimensions, "categories": counts}
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class LocalVectorStore:
+    """
+    In-process alternative to the match_documents RPC: memory-mapped float32
+    partitions per doc_category, searched with a vectorized matmul + argpartition.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+
+        self.path = path
+        self.dimensions = manifest["dimensions"]
+        self.matrices = {}
+        self.records = {}
+        self._compact = {}  # (category, storage) -> compact matrix, built on first use
+        for category, count in manifest["categories"].items():
+            if count == 0:
+                continue
+            self.matrices[category] = np.memmap(
+                os.path.join(path, f"{category}.f32"), dtype=np.float32, mode="r",
+                shape=(count, self.dimensions),
+            )
+            with open(os.path.join(path, f"{category}.jsonl")) as f:
+                self.records[category] = [json.loads(line) for line in f]
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.matrices)
+
+    def category_centroids(self) -> dict:
+        """
+        Mean (unit-normalized) embedding per doc_category, e.g. for IntentRouter.set_centroids().
+        """
+        return {name: np.asarray(matrix.mean(axis=0)) for name, matrix in self.matrices.items()}
+
+    def _compact_matrix(self, category: str, storage: str) -> np.ndarray:
+        key = (category, storage)
+        compact = self._compact.get(key)
+        if compact is None:
+            matrix = self.matrices[category]
+            if storage == "halfvec":
+                compact = _normalize(np.asarray(matrix[:, :COMPACT_DIMENSIONS]))
+            else:
+                compact = _sign_bits(np.asarray(matrix))
+            compact = self._compact.setdefault(key, compact)
+        return compact
+
+    def _coarse_scores(self, category: str, storage: str, queries: np.ndarray) -> np.ndarray:
+        compact = self._compact_matrix(category, storage)
+        if storage == "halfvec":
+            return _normalize(queries[:, :COMPACT_DIMENSIONS]) @ compact.T
+        # Negated Hamming distance, so that higher is better as for cosine
+        return -np.stack([
+            _POPCOUNT_16[np.bitwise_xor(compact, q)].sum(axis=1, dtype=np.int32) for q in _sign_bits(queries)
+        ])
+
+    def search(self, query_embedding: Sequence[float], k: int = 3, category: Union[str, Sequence[str]] = None,
+               threshold: float = 0.0, storage: str = "full", rerank_factor: int = 4,
+               per_category_k: int = None) -> List[dict]:
+        return self.search_batch([query_embedding], k, category, threshold, storage, rerank_factor,
+                                 per_category_k)[0]
+
+    def search_batch(self, query_embeddings: Sequence[Sequence[float]], k: int = 3,
+                     category: Union[str, Sequence[str]] = None, threshold: float = 0.0, storage: str = "full",
+                     rerank_factor: int = 4, per_category_k: int = None) -> List[List[dict]]:
+        """
+        Top-k cosine matches for many queries at once. Rows have the same shape
+        as the match_documents RPC output (id, content, metadata, doc_category, similarity).
+        `category` is one doc_category, a list of them, or None for all;
+        `per_category_k` caps how many of the k results one category may supply.
+        With a compact `storage` the partition is scanned coarsely and only
+        k * rerank_factor candidates are scored at full precision.
+        """
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"unknown storage {storage!r}, expected one of {STORAGE_MODES}")
+        if category is None:
+            categories = self.categories
+        elif isinstance(category, str):
+            categories = [category]
+        else:
+            categories = list(category)
+        quota = min(k, per_category_k) if per_category_k else k
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+
+        # 1. Per-partition top-k: one (queries x rows) matmul, argpartition along rows
+        scores, rows, owners = [], [], []
+        for name in categories:
+            matrix = self.matrices.get(name)
+            if matrix is None:
+                continue
+            if storage == "full":
+                partition_scores = queries @ matrix.T
+                top = _top_k(partition_scores, quota)
+                top_scores = np.take_along_axis(partition_scores, top, axis=1)
+            else:
+                candidates = _top_k(self._coarse_scores(name, storage, queries), quota * max(rerank_factor, 1))
+                # Exact re-rank: gather only the candidate rows from the full matrix
+                exact = np.einsum("qd,qcd->qc", queries, matrix[candidates])
+                keep = _top_k(exact, quota)
+                top = np.take_along_axis(candidates, keep, axis=1)
+                top_scores = np.take_along_axis(exact, keep, axis=1)
+            scores.append(top_scores)
+            rows.append(top)
+            owners.extend([name] * top.shape[1])
+
+        if not scores:
+            return [[] for _ in queries]
+
+        # 2. Merge partitions and order each query's candidates by similarity
+        merged_scores = np.concatenate(scores, axis=1)
+        merged_rows = np.concatenate(rows, axis=1)
+        order = np.argsort(-merged_scores, axis=1)[:, :k]
+
+        results = []
+        for q, columns in enumerate(order):
+            matches = []
+            for column in columns:
+                similarity = float(merged_scores[q, column])
+                if similarity <= threshold:
+                    break
+                record = self.records[owners[column]][int(merged_rows[q, column])]
+                matches.append({**record, "similarity": similarity})
+            results.append(matches)
+        return results
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_local_store(path: str) -> LocalVectorStore:
+    """
+    Returns the process-wide store for `path`, loading (memory-mapping) it once.
+    """
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = LocalVectorStore(path)
+        return _stores[path]
@@ -0,0 +1,337 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, Optional, TypeVar
+from langflow_components.src.tracing import metrics
+
+T = TypeVar("T")
+
+# --- Endpoint Policies ---
+# Every external call goes through one named endpoint. Each endpoint has its
+# own concurrency cap, request-rate token bucket, retry policy and circuit
+# breaker, so a slow or rate-limited dependency degrades on its own instead of
+# dragging the others into a retry storm.
+#
+# Rates default to OpenAI usage tier 1 and can be raised per endpoint, e.g.
+#   MERIDIAN_OPENAI_CHAT_RPM=5000  MERIDIAN_OPENAI_CHAT_CONCURRENCY=64
+DEFAULT_POLICIES = {
+    #                    concurrency  rpm   timeout(s)
+    "openai.embeddings": (16,         3000, 20.0),
+    "openai.chat":       (16,         500,  60.0),
+    "supabase.rpc":      (32,         0,    10.0),  # 0 = no rate limit
+    "supabase.rest":     (32,         0,    10.0),
+}
+MAX_ATTEMPTS = int(os.getenv("MERIDIAN_RETRY_ATTEMPTS", "4"))
+BASE_DELAY = float(os.getenv("MERIDIAN_RETRY_BASE_SECONDS", "0.25"))
+MAX_DELAY = float(os.getenv("MERIDIAN_RETRY_MAX_SECONDS", "8"))
+BREAKER_THRESHOLD = int(os.getenv("MERIDIAN_BREAKER_FAILURES", "5"))  # consecutive failures
+BREAKER_RESET = float(os.getenv("MERIDIAN_BREAKER_RESET_SECONDS", "30"))
+# postgrest.APIError has no status attribute: `code` is the HTTP status when the
+# body was not JSON, otherwise a PostgREST/SQLSTATE code. These ones are transient.
+TRANSIENT_DB_CODES = {"PGRST000", "PGRST001", "PGRST002", "57014", "40001", "40P01", "53300"}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without calling the dependency while its circuit breaker is open.
+    """
+
+
+def _env(endpoint: str, setting: str, default):
+    name = f"MERIDIAN_{endpoint.upper().replace('.', '_')}_{setting}"
+    return type(default)(os.getenv(name, default))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Transient failures only: timeouts, connection errors, 408/429 and 5xx.
+    Client errors (bad request, auth, not found) fail immediately.
+    """
+    transient = [TimeoutError, asyncio.TimeoutError, ConnectionError]
+    # An SDK's exceptions can only be raised once it is imported; no need to import it here
+    for module, name in (("openai", "APIConnectionError"), ("httpx", "TransportError")):
+        if module in sys.modules:
+            transient.append(getattr(sys.modules[module], name))
+    if isinstance(exc, tuple(transient)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None:
+        code = str(getattr(exc, "code", "") or "")
+        if code in TRANSIENT_DB_CODES or code.startswith("08"):  # 08xxx: connection exceptions
+            return True
+        status = int(code) if code.isdigit() and len(code) == 3 else None
+    return status in (408, 429) or (isinstance(status, int) and status >= 500)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Request-rate limiter: `rate` tokens per second, bursts up to `capacity`.
+    Tokens are reserved up front, so callers get their wait time immediately
+    and waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """
+        Takes `cost` tokens and returns how long the caller must wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures and fails fast for
+    `reset_timeout` seconds; then lets a single trial call through (half-open)
+    and closes again if it succeeds. Callers hold the permit returned by
+    acquire() and must hand it back to release() however the call ends.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def acquire(self) -> Optional[str]:
+        """
+        "closed" for a normal call, "trial" for the half-open probe, None when rejected.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return None
+
+    def allow(self) -> bool:
+        return self.acquire() is not None
+
+    def release(self, permit: Optional[str]):
+        """
+        Ends a call without a verdict (non-retryable error, cancellation): a
+        trial that neither succeeded nor failed frees the slot for the next one.
+        """
+        if permit == "trial":
+            with self._lock:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class Endpoint:
+    """
+    Guards calls to one external endpoint: concurrency cap, rate limit,
+    retries with full-jitter exponential backoff, an overall deadline and a
+    circuit breaker. `call()` is for blocking code, `acall()` for coroutines.
+    Blocking calls run on the endpoint's worker pool (`concurrency` threads) so
+    that each attempt can be abandoned once the deadline passes.
+    """
+
+    def __init__(self, name: str, concurrency: int, rpm: float, timeout: float,
+                 attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY):
+        self.name = name
+        self.concurrency = concurrency
+        self.timeout = timeout  # overall deadline per call, retries included
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rpm / 60, max(1.0, rpm / 60)) if rpm else None
+        self.breaker = CircuitBreaker()
+        self._executor = None  # created on the first blocking call
+        self._executor_lock = threading.Lock()
+        # asyncio primitives belong to one event loop, so they are kept per loop
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = _retry_after(exc)
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _admit(self, fallback) -> Optional[str]:
+        permit = self.breaker.acquire()
+        if permit is not None:
+            return permit
+        metrics.incr(f"resilience.{self.name}.rejected")
+        if fallback is not None:
+            return None
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open), failing fast")
+
+    def _failed(self, exc: BaseException, attempt: int, deadline: float) -> Optional[float]:
+        """
+        Books a failure; returns the backoff delay if another attempt fits.
+        Non-retryable errors (bad request, not found, SDK misuse) say nothing
+        about the dependency's health and are not counted by the breaker.
+        """
+        if not is_retryable(exc):
+            return None
+        self.breaker.record_failure()
+        metrics.incr(f"resilience.{self.name}.failures")
+        delay = self._backoff(attempt, exc)
+        if attempt + 1 >= self.attempts or time.monotonic() + delay >= deadline:
+            return None
+        if self.breaker.state == "open":
+            return None
+        metrics.incr(f"resilience.{self.name}.retries")
+        return delay
+
+    def _run_bounded(self, fn: Callable[[], T], deadline: float) -> T:
+        """
+        Runs `fn` on the worker pool and waits at most until `deadline`. A
+        blocking SDK call cannot be interrupted: on timeout it is left to
+        finish in the background (the clients' own timeouts bound it).
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{self.name}: deadline exceeded")
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix=f"meridian-{self.name}")
+        # Copy the caller's context so spans and traces inside `fn` still attach
+        future = self._executor.submit(contextvars.copy_context().run, fn)
+        try:
+            return future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            future.cancel()  # drops it if it is still queued behind the concurrency cap
+            raise TimeoutError(f"{self.name}: no response within {self.timeout:g}s") from None
+
+    def call(self, fn: Callable[[], T], fallback: Callable[[], T] = None) -> T:
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.attempts):
+            permit = self._admit(fallback)
+            if permit is None:
+                return fallback()
+            try:
+                if self.bucket is not None:
+                    time.sleep(self.bucket.reserve())
+                result = self._run_bounded(fn, deadline)
+                self.breaker.record_success()
+                return result
+            except Exception as exc:
+                delay = self._failed(exc, attempt, deadline)
+                if delay is None:
+                    if fallback is not None:
+                        return fallback()
+                    raise
+            finally:
+                self.breaker.release(permit)
+            time.sleep(delay)
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], fallback: Callable[[], T] = None) -> T:
+        """
+        `fn` must create a fresh awaitable per attempt (e.g. a lambda around the SDK call).
+        """
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.attempts):
+            permit = self._admit(fallback)
+            if permit is None:
+                return fallback()
+            try:
+                if self.bucket is not None:
+                    await asyncio.sleep(self.bucket.reserve())
+                async with self._async_semaphore():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError(f"{self.name}: deadline exceeded")
+                    result = await asyncio.wait_for(fn(), timeout=remaining)
+                self.breaker.record_success()
+                return result
+            except Exception as exc:
+                delay = self._failed(exc, attempt, deadline)
+                if delay is None:
+                    if fallback is not None:
+                        return fallback()
+                    raise
+            finally:
+                # Also runs on cancellation (CancelledError is not an Exception)
+                self.breaker.release(permit)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {"state": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def get_endpoint(name: str) -> Endpoint:
+    """
+    Returns the process-wide guard for `name` (see DEFAULT_POLICIES).
+    """
+    with _endpoints_lock:
+        endpoint = _endpoints.get(name)
+        if endpoint is None:
+            concurrency, rpm, timeout = DEFAULT_POLICIES.get(name, (16, 0, 30.0))
+            endpoint = Endpoint(
+                name,
+                concurrency=_env(name, "CONCURRENCY", concurrency),
+                rpm=_env(name, "RPM", float(rpm)),
+                timeout=_env(name, "TIMEOUT", timeout),
+            )
+            _endpoints[name] = endpoint
+        return endpoint
+
+
+def endpoint_stats() -> dict:
+    with _endpoints_lock:
+        return {name: endpoint.stats() for name, endpoint in _endpoints.items()}
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+# --- Per-request Trace ---
+# The active trace lives in a ContextVar, so components record spans without
+# any plumbing: asyncio tasks and asyncio.to_thread() inherit it automatically.
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("meridian_trace", default=None)
+
+HISTOGRAM_WINDOW = 2048  # most recent samples kept per stage
+
+
+class LatencyHistogram:
+    """
+    Sliding window of recent latencies plus lifetime count/sum.
+    """
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, ms: float):
+        self.samples.append(ms)
+        self.count += 1
+        self.total += ms
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide latency histograms per stage and monotonically increasing counters.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, ms: float):
+        with self._lock:
+            self.histograms.setdefault(stage, LatencyHistogram()).observe(ms)
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "stages": {stage: h.summary() for stage, h in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+
+    def export_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+metrics = MetricsRegistry()
+
+
+class Trace:
+    """
+    Ordered spans (stage, ms, attributes) for one pipeline run.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[dict] = []
+
+    def add(self, stage: str, ms: float, **attrs):
+        self.spans.append({"stage": stage, "ms": round(ms, 2), **attrs})
+        metrics.observe(stage, ms)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_rows(self) -> List[dict]:
+        return list(self.spans)
+
+
+def start_trace() -> Trace:
+    """
+    Begins a trace for the current task/context and returns it.
+    """
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Times a block. Yields a dict the caller can enrich (token counts, result
+    counts...). Always feeds the histograms; attaches to the active trace if any.
+    """
+    started = time.perf_counter()
+    record = dict(attrs)
+    try:
+        yield record
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, ms, **record)
+        else:
+            metrics.observe(stage, ms)
@@ -0,0 +1,20 @@
+/*
+ * MIGRATION: 20250102_content_hash.sql
+ * PURPOSE: Incremental ingestion (skip unchanged chunks, upsert changed ones)
+ * FEATURES: content_hash column with unique constraint, source lookup index
+ */
+
+-- 1. Add the chunk fingerprint written by ingestion/ingest_docs.py
+-- sha256 of (category, source, content). Legacy rows keep NULL and are
+-- removed by the next full sync.
+alter table public.documents
+  add column if not exists content_hash text;
+
+-- 2. Unique constraint (NULLs are distinct, so legacy rows do not conflict)
+-- This is the conflict target for `upsert(..., on_conflict="content_hash")`.
+alter table public.documents
+  add constraint documents_content_hash_key unique (content_hash);
+
+-- 3. Index the source so per-file syncs and audits do not scan the table
+create index if not exists documents_source_idx
+  on public.documents ((metadata->>'source'));
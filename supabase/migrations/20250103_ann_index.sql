@@ -0,0 +1,77 @@
+/*
+ * MIGRATION: 20250103_ann_index.sql
+ * PURPOSE: Keep vector search latency flat as documents grows to millions of chunks
+ * FEATURES: HNSW indexes (global + per doc_category partial), single-distance match_documents,
+ *           tunable hnsw.ef_search / ivfflat.probes per call
+ */
+
+-- 1. Global HNSW index (cosine distance, matches the <=> operator used below)
+-- Serves queries without a category filter.
+create index if not exists documents_embedding_hnsw_idx
+  on public.documents using hnsw (embedding vector_cosine_ops)
+  with (m = 16, ef_construction = 64);
+
+-- 2. Per-category partial indexes
+-- A filtered query on one category walks a graph that only contains that
+-- category, instead of post-filtering a global top-k (which loses recall).
+-- Add one index per new doc_category value.
+create index if not exists documents_embedding_technical_hnsw_idx
+  on public.documents using hnsw (embedding vector_cosine_ops)
+  with (m = 16, ef_construction = 64)
+  where doc_category = 'technical';
+
+create index if not exists documents_embedding_business_hnsw_idx
+  on public.documents using hnsw (embedding vector_cosine_ops)
+  with (m = 16, ef_construction = 64)
+  where doc_category = 'business';
+
+create index if not exists documents_doc_category_idx
+  on public.documents (doc_category);
+
+-- 3. Rewrite match_documents
+-- * The distance is computed once per candidate (ORDER BY reuses the select-list
+--   expression; the threshold is applied to the top-k afterwards, which returns
+--   the same rows as filtering first because similarity is monotonic in distance).
+-- * The category is inlined as a literal via dynamic SQL so the planner can
+--   match the partial indexes above (a generic plpgsql plan cannot).
+-- * ef_search / probes are set transaction-locally, so each RPC can trade
+--   recall for latency without touching server config.
+drop function if exists match_documents(vector, float, int, text);
+
+create or replace function match_documents (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int,
+  filter_category text,
+  ef_search int default 40,
+  probes int default 10
+)
+returns table (
+  id bigint,
+  content text,
+  metadata jsonb,
+  doc_category text,
+  similarity float
+)
+language plpgsql
+as $$
+begin
+  perform set_config('hnsw.ef_search', greatest(ef_search, match_count)::text, true);
+  perform set_config('ivfflat.probes', probes::text, true);
+
+  return query execute format(
+    'select ranked.id, ranked.content, ranked.metadata, ranked.doc_category, 1 - ranked.distance as similarity
+     from (
+       select d.id, d.content, d.metadata, d.doc_category, d.embedding <=> $1 as distance
+       from public.documents d
+       where d.doc_category = %L
+       order by d.embedding <=> $1
+       limit $2
+     ) ranked
+     where 1 - ranked.distance > $3
+     order by ranked.distance',
+    filter_category
+  )
+  using query_embedding, match_count, match_threshold;
+end;
+$$;
@@ -0,0 +1,11 @@
+/*
+ * MIGRATION: 20250104_chat_history_index.sql
+ * PURPOSE: Fast session rehydration from chat_history
+ * FEATURES: composite (session_id, created_at) index
+ */
+
+-- 1. The app reads "last N turns of a session" on page load:
+--    where session_id = $1 order by created_at desc limit N
+-- The composite index serves that as a single backward index range scan.
+create index if not exists chat_history_session_created_idx
+  on public.chat_history (session_id, created_at desc);
@@ -0,0 +1,87 @@
+/*
+ * MIGRATION: 20250105_hybrid_search.sql
+ * PURPOSE: True hybrid retrieval (full-text + vector) in a single RPC
+ * FEATURES: generated tsvector column + GIN index, hybrid_match_documents with
+ *           reciprocal rank fusion (RRF)
+ */
+
+-- 1. Full-text representation of each chunk
+-- Generated and stored, so ingestion does not change and the GIN index below
+-- stays in sync on every insert/upsert.
+alter table public.documents
+  add column if not exists fts tsvector
+  generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+create index if not exists documents_fts_idx
+  on public.documents using gin (fts);
+
+-- 2. Hybrid search with reciprocal rank fusion
+-- Each side ranks its own candidates (keyword: ts_rank_cd over websearch
+-- syntax, so exact terms like API names and error codes match; semantic:
+-- cosine distance over the partial HNSW indexes). A row scores
+--   full_text_weight / (rrf_k + keyword_rank) + semantic_weight / (rrf_k + semantic_rank)
+-- and rows found by only one side still get that side's share.
+-- Like match_documents, the category is inlined via dynamic SQL so the
+-- planner can use the per-category partial indexes.
+create or replace function hybrid_match_documents (
+  query_text text,
+  query_embedding vector(1536),
+  match_count int,
+  filter_category text,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50,
+  ef_search int default 40
+)
+returns table (
+  id bigint,
+  content text,
+  metadata jsonb,
+  doc_category text,
+  similarity float,
+  keyword_rank int,
+  semantic_rank int,
+  score float
+)
+language plpgsql
+as $$
+declare
+  candidates int := match_count * 2;  -- per side, before fusion
+begin
+  perform set_config('hnsw.ef_search', greatest(ef_search, candidates)::text, true);
+
+  return query execute format(
+    'with full_text as (
+       select d.id,
+              row_number() over (order by ts_rank_cd(d.fts, websearch_to_tsquery(''english'', $1)) desc) as rank_ix
+       from public.documents d
+       where d.doc_category = %1$L
+         and d.fts @@ websearch_to_tsquery(''english'', $1)
+       order by rank_ix
+       limit $3
+     ),
+     semantic as (
+       select d.id,
+              row_number() over (order by d.embedding <=> $2) as rank_ix
+       from public.documents d
+       where d.doc_category = %1$L
+       order by d.embedding <=> $2
+       limit $3
+     )
+     select d.id, d.content, d.metadata, d.doc_category,
+            1 - (d.embedding <=> $2) as similarity,
+            full_text.rank_ix::int as keyword_rank,
+            semantic.rank_ix::int as semantic_rank,
+            coalesce($5 / ($7 + full_text.rank_ix), 0.0)
+              + coalesce($6 / ($7 + semantic.rank_ix), 0.0) as score
+     from full_text
+     full outer join semantic on full_text.id = semantic.id
+     join public.documents d on d.id = coalesce(full_text.id, semantic.id)
+     order by score desc
+     limit $4',
+    filter_category
+  )
+  using query_text, query_embedding, candidates, match_count,
+        full_text_weight, semantic_weight, rrf_k;
+end;
+$$;
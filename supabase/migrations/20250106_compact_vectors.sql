@@ -0,0 +1,98 @@
+/*
+ * MIGRATION: 20250106_compact_vectors.sql
+ * PURPOSE: Smaller, faster ANN indexes with full-precision results
+ * FEATURES: halfvec(512) and binary-quantized expression indexes per doc_category,
+ *           match_documents_compact (coarse search + exact re-rank)
+ * REQUIRES: pgvector >= 0.7.0 (halfvec, bit, subvector, binary_quantize)
+ */
+
+-- 1. Compact representations are derived from the existing vector(1536) column
+-- text-embedding-3 vectors are "Matryoshka" embeddings: the first 512
+-- dimensions are themselves a usable embedding (cosine is scale-invariant, so
+-- no re-normalization is needed). Indexing expressions instead of new columns
+-- means ingestion is unchanged and nothing has to be re-embedded.
+--   full    vector(1536)  6144 bytes/row in the index
+--   halfvec halfvec(512)  1024 bytes/row  (~6x smaller)
+--   binary  bit(1536)      192 bytes/row  (~32x smaller)
+-- Once compact mode is in use, the full-precision HNSW indexes from
+-- 20250103_ann_index.sql can be dropped to reclaim their memory.
+create index if not exists documents_embedding_half_technical_hnsw_idx
+  on public.documents using hnsw ((subvector(embedding, 1, 512)::halfvec(512)) halfvec_cosine_ops)
+  with (m = 16, ef_construction = 64)
+  where doc_category = 'technical';
+
+create index if not exists documents_embedding_half_business_hnsw_idx
+  on public.documents using hnsw ((subvector(embedding, 1, 512)::halfvec(512)) halfvec_cosine_ops)
+  with (m = 16, ef_construction = 64)
+  where doc_category = 'business';
+
+create index if not exists documents_embedding_bit_technical_hnsw_idx
+  on public.documents using hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+  with (m = 16, ef_construction = 64)
+  where doc_category = 'technical';
+
+create index if not exists documents_embedding_bit_business_hnsw_idx
+  on public.documents using hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+  with (m = 16, ef_construction = 64)
+  where doc_category = 'business';
+
+-- 2. Coarse search on the compact index, exact re-rank on the full vectors
+-- The inner query walks the compact index for match_count * rerank_factor
+-- candidates; only those rows have their full-precision distance computed.
+-- The ORDER BY expressions must match the index expressions above verbatim.
+create or replace function match_documents_compact (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int,
+  filter_category text,
+  storage text default 'halfvec',
+  rerank_factor int default 4,
+  ef_search int default 40
+)
+returns table (
+  id bigint,
+  content text,
+  metadata jsonb,
+  doc_category text,
+  similarity float
+)
+language plpgsql
+as $$
+declare
+  candidates int := match_count * greatest(rerank_factor, 1);
+  coarse_order text;
+begin
+  perform set_config('hnsw.ef_search', greatest(ef_search, candidates)::text, true);
+
+  if storage = 'halfvec' then
+    coarse_order := 'subvector(d.embedding, 1, 512)::halfvec(512) <=> subvector($1, 1, 512)::halfvec(512)';
+  elsif storage = 'binary' then
+    coarse_order := 'binary_quantize(d.embedding)::bit(1536) <~> binary_quantize($1)::bit(1536)';
+  else
+    raise exception 'unknown storage %, expected halfvec or binary', storage;
+  end if;
+
+  return query execute format(
+    'select reranked.id, reranked.content, reranked.metadata, reranked.doc_category,
+            1 - reranked.distance as similarity
+     from (
+       select coarse.id, coarse.content, coarse.metadata, coarse.doc_category,
+              coarse.embedding <=> $1 as distance
+       from (
+         select d.id, d.content, d.metadata, d.doc_category, d.embedding
+         from public.documents d
+         where d.doc_category = %L
+         order by %s
+         limit $2
+       ) coarse
+       order by distance
+       limit $3
+     ) reranked
+     where 1 - reranked.distance > $4
+     order by reranked.distance',
+    filter_category,
+    coarse_order
+  )
+  using query_embedding, candidates, match_count, match_threshold;
+end;
+$$;
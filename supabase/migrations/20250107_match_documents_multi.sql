@@ -0,0 +1,78 @@
+/*
+ * MIGRATION: 20250107_match_documents_multi.sql
+ * PURPOSE: Search several categories for several query embeddings in one RPC
+ * FEATURES: match_documents_multi (batched queries, category set, per-category quotas)
+ */
+
+-- 1. Batched, multi-category search
+-- * query_embeddings is a JSON array of embeddings (PostgREST passes jsonb
+--   reliably; each element is cast to vector(1536) once, in the CTE).
+-- * One LATERAL top-k per category, with the category inlined as a literal,
+--   so each branch walks that category's partial HNSW index.
+-- * per_category_count (default: match_count) caps what one category can
+--   contribute; the branches are then merged and cut to match_count per query.
+-- Rows carry query_index (0-based position in query_embeddings).
+create or replace function match_documents_multi (
+  query_embeddings jsonb,
+  match_threshold float,
+  match_count int,
+  filter_categories text[],
+  per_category_count int default null,
+  ef_search int default 40
+)
+returns table (
+  query_index int,
+  id bigint,
+  content text,
+  metadata jsonb,
+  doc_category text,
+  similarity float
+)
+language plpgsql
+as $$
+declare
+  category text;
+  branches text[] := '{}';
+  quota int := least(coalesce(per_category_count, match_count), match_count);
+begin
+  if coalesce(array_length(filter_categories, 1), 0) = 0 or jsonb_array_length(query_embeddings) = 0 then
+    return;
+  end if;
+
+  perform set_config('hnsw.ef_search', greatest(ef_search, quota)::text, true);
+
+  foreach category in array filter_categories loop
+    branches := branches || format(
+      'select q.query_index, m.id, m.content, m.metadata, m.doc_category, m.distance
+       from queries q
+       cross join lateral (
+         select d.id, d.content, d.metadata, d.doc_category, d.embedding <=> q.embedding as distance
+         from public.documents d
+         where d.doc_category = %L
+         order by d.embedding <=> q.embedding
+         limit $2
+       ) m',
+      category
+    );
+  end loop;
+
+  return query execute format(
+    'with queries as (
+       select (e.ord - 1)::int as query_index, (e.value::text)::vector(1536) as embedding
+       from jsonb_array_elements($1) with ordinality as e(value, ord)
+     )
+     select ranked.query_index, ranked.id, ranked.content, ranked.metadata, ranked.doc_category,
+            1 - ranked.distance as similarity
+     from (
+       select candidates.*,
+              row_number() over (partition by candidates.query_index order by candidates.distance) as rank_ix
+       from (%s) candidates
+     ) ranked
+     where ranked.rank_ix <= $3
+       and 1 - ranked.distance > $4
+     order by ranked.query_index, ranked.distance',
+    array_to_string(branches, ' union all ')
+  )
+  using query_embeddings, quota, match_count, match_threshold;
+end;
+$$;
@@ -0,0 +1,89 @@
+/*
+ * MIGRATION: 20250108_corpus_stats.sql
+ * PURPOSE: Knowledge-base health check computed in the database (no row transfer)
+ * FEATURES: corpus_stats() -> per-category counts, chunk length, freshness,
+ *           embedding integrity, table and vector index size/usage as jsonb
+ */
+
+-- 1. Corpus statistics
+-- * One grouped pass over the documents heap. Embeddings (6 KB each) live in
+--   TOAST, and `embedding is null` never detoasts them, so the scan reads the
+--   narrow heap rows only.
+-- * Wrong-dimension rows are impossible while the column is typed vector(1536),
+--   so vector_dims() (which does detoast every embedding) only runs when
+--   deep => true. The declared dimension is reported either way.
+-- * Table and index figures come from the catalog and pg_stat_* views: sizes,
+--   scan counters, validity and each partial index's predicate.
+create or replace function corpus_stats (
+  deep boolean default false
+)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+  declared_dims int;
+  categories jsonb;
+  table_stats jsonb;
+  indexes jsonb;
+begin
+  -- vector(n) stores n as the type modifier; -1 means an unconstrained column
+  select nullif(a.atttypmod, -1) into declared_dims
+  from pg_attribute a
+  where a.attrelid = 'public.documents'::regclass and a.attname = 'embedding';
+
+  select coalesce(jsonb_agg(to_jsonb(c) order by c.doc_category), '[]'::jsonb) into categories
+  from (
+    select
+      d.doc_category,
+      count(*) as documents,
+      count(distinct d.metadata->>'source') as sources,
+      round(avg(octet_length(d.content)))::int as avg_chunk_bytes,
+      max(d.created_at) as newest_ingested_at,
+      count(*) filter (where d.embedding is null) as null_embeddings,
+      case when deep then
+        count(*) filter (where d.embedding is not null
+                           and vector_dims(d.embedding) <> coalesce(declared_dims, 1536))
+      end as wrong_dimension_embeddings,
+      count(*) filter (where d.content_hash is null) as unhashed_rows
+    from public.documents d
+    group by d.doc_category
+  ) c;
+
+  select jsonb_build_object(
+    'rows_estimate', greatest(c.reltuples, 0)::bigint,
+    'table_bytes', pg_table_size(c.oid),
+    'total_bytes', pg_total_relation_size(c.oid),
+    'dead_rows', s.n_dead_tup,
+    'last_analyzed_at', greatest(s.last_analyze, s.last_autoanalyze),
+    'last_vacuumed_at', greatest(s.last_vacuum, s.last_autovacuum)
+  ) into table_stats
+  from pg_class c
+  left join pg_stat_user_tables s on s.relid = c.oid
+  where c.oid = 'public.documents'::regclass;
+
+  select coalesce(jsonb_agg(jsonb_build_object(
+    'name', i.relname,
+    'method', am.amname,
+    'bytes', pg_relation_size(i.oid),
+    'scans', coalesce(s.idx_scan, 0),
+    'tuples_read', coalesce(s.idx_tup_read, 0),
+    'valid', x.indisvalid,
+    'predicate', pg_get_expr(x.indpred, x.indrelid)
+  ) order by i.relname), '[]'::jsonb) into indexes
+  from pg_index x
+  join pg_class i on i.oid = x.indexrelid
+  join pg_am am on am.oid = i.relam
+  left join pg_stat_user_indexes s on s.indexrelid = x.indexrelid
+  where x.indrelid = 'public.documents'::regclass;
+
+  return jsonb_build_object(
+    'generated_at', now(),
+    'declared_dimensions', declared_dims,
+    'deep', deep,
+    'categories', categories,
+    'table', table_stats,
+    'indexes', indexes
+  );
+end;
+$$;
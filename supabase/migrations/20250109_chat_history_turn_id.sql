@@ -0,0 +1,16 @@
+/*
+ * MIGRATION: 20250109_chat_history_turn_id.sql
+ * PURPOSE: Idempotent chat history writes
+ * FEATURES: client-generated turn_id with a unique index (upsert target)
+ */
+
+-- 1. The app's write-behind queue retries failed batch inserts. When a
+--    request succeeded but its response was lost, the retry would insert the
+--    same turns again; with a client-generated turn_id the batch is written
+--    as `insert ... on conflict (turn_id) do nothing` instead.
+--    Existing rows get a generated id, so the column can be not null.
+alter table public.chat_history
+  add column if not exists turn_id uuid not null default gen_random_uuid();
+
+create unique index if not exists chat_history_turn_id_key
+  on public.chat_history (turn_id);
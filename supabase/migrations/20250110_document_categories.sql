@@ -0,0 +1,29 @@
+/*
+ * MIGRATION: 20250110_document_categories.sql
+ * PURPOSE: Discover the corpus categories without scanning the documents
+ * FEATURES: document_categories() -> distinct doc_category via a loose index scan
+ */
+
+-- 1. Distinct categories
+-- The retriever searches every category for "general" questions and caches
+-- this list. Postgres has no skip scan, so `select distinct` would read the
+-- whole index; the recursive CTE instead jumps from one category to the next
+-- on documents_doc_category_idx: one index probe per category.
+create or replace function document_categories ()
+returns table (doc_category text)
+language sql
+stable
+as $$
+  with recursive categories as (
+    (select d.doc_category from public.documents d
+     where d.doc_category is not null
+     order by d.doc_category limit 1)
+    union all
+    select (select d.doc_category from public.documents d
+            where d.doc_category > c.doc_category
+            order by d.doc_category limit 1)
+    from categories c
+    where c.doc_category is not null
+  )
+  select categories.doc_category from categories where categories.doc_category is not null;
+$$;
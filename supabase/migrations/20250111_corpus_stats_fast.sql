@@ -0,0 +1,140 @@
+/*
+ * MIGRATION: 20250111_corpus_stats_fast.sql
+ * PURPOSE: Keep the default health check constant-time as the corpus grows
+ * FEATURES: corpus_stats() without a table scan unless deep => true;
+ *           freshness and integrity indexes it probes instead
+ */
+
+-- 1. Indexes probed by the fast path
+-- * (doc_category, created_at): the newest ingestion per category is one
+--   backward index probe.
+-- * Partial indexes on the rows that should not exist (missing embedding,
+--   missing content hash): normally empty, so counting them is free and they
+--   cost nothing on the ingestion write path.
+create index if not exists documents_category_created_idx
+  on public.documents (doc_category, created_at desc);
+
+create index if not exists documents_missing_embedding_idx
+  on public.documents (doc_category) where embedding is null;
+
+create index if not exists documents_unhashed_idx
+  on public.documents (doc_category) where content_hash is null;
+
+-- 2. Corpus statistics
+-- * deep => false (default): categories come from the loose index scan in
+--   document_categories(); per-category row counts are planner estimates
+--   (pg_class.reltuples x the doc_category frequency in pg_stats), with an
+--   exact index-only count only for a category the statistics do not know
+--   yet (e.g. before the first ANALYZE). Source counts and chunk length need
+--   every row and are left null.
+-- * deep => true: the full grouped pass over the heap (exact counts,
+--   distinct sources, average chunk size) plus the embedding dimension check.
+-- * Table and index figures come from the catalog and pg_stat_* views.
+create or replace function corpus_stats (
+  deep boolean default false
+)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+  declared_dims int;
+  rows_estimate float4;
+  mcv_values text[];
+  mcv_freqs float4[];
+  category text;
+  estimate bigint;
+  categories jsonb := '[]'::jsonb;
+  table_stats jsonb;
+  indexes jsonb;
+begin
+  -- vector(n) stores n as the type modifier; -1 means an unconstrained column
+  select nullif(a.atttypmod, -1) into declared_dims
+  from pg_attribute a
+  where a.attrelid = 'public.documents'::regclass and a.attname = 'embedding';
+
+  if deep then
+    select coalesce(jsonb_agg(to_jsonb(c) order by c.doc_category), '[]'::jsonb) into categories
+    from (
+      select
+        d.doc_category,
+        count(*) as documents,
+        false as documents_estimated,
+        count(distinct d.metadata->>'source') as sources,
+        round(avg(octet_length(d.content)))::int as avg_chunk_bytes,
+        max(d.created_at) as newest_ingested_at,
+        count(*) filter (where d.embedding is null) as null_embeddings,
+        count(*) filter (where d.embedding is not null
+                           and vector_dims(d.embedding) <> coalesce(declared_dims, 1536))
+          as wrong_dimension_embeddings,
+        count(*) filter (where d.content_hash is null) as unhashed_rows
+      from public.documents d
+      group by d.doc_category
+    ) c;
+  else
+    select c.reltuples into rows_estimate
+    from pg_class c
+    where c.oid = 'public.documents'::regclass;
+
+    select s.most_common_vals::text::text[], s.most_common_freqs into mcv_values, mcv_freqs
+    from pg_stats s
+    where s.schemaname = 'public' and s.tablename = 'documents' and s.attname = 'doc_category';
+
+    for category in select dc.doc_category from document_categories() dc loop
+      -- reltuples is -1 until the table is first analyzed
+      estimate := case when rows_estimate > 0
+                       then round(mcv_freqs[array_position(mcv_values, category)] * rows_estimate) end;
+      categories := categories || jsonb_build_object(
+        'doc_category', category,
+        'documents', coalesce(nullif(estimate, 0),
+                              (select count(*) from public.documents d where d.doc_category = category)),
+        'documents_estimated', coalesce(estimate, 0) > 0,
+        'sources', null,
+        'avg_chunk_bytes', null,
+        'newest_ingested_at', (select max(d.created_at) from public.documents d where d.doc_category = category),
+        'null_embeddings', (select count(*) from public.documents d
+                            where d.doc_category = category and d.embedding is null),
+        'wrong_dimension_embeddings', null,
+        'unhashed_rows', (select count(*) from public.documents d
+                          where d.doc_category = category and d.content_hash is null)
+      );
+    end loop;
+  end if;
+
+  select jsonb_build_object(
+    'rows_estimate', greatest(c.reltuples, 0)::bigint,
+    'table_bytes', pg_table_size(c.oid),
+    'total_bytes', pg_total_relation_size(c.oid),
+    'dead_rows', s.n_dead_tup,
+    'last_analyzed_at', greatest(s.last_analyze, s.last_autoanalyze),
+    'last_vacuumed_at', greatest(s.last_vacuum, s.last_autovacuum)
+  ) into table_stats
+  from pg_class c
+  left join pg_stat_user_tables s on s.relid = c.oid
+  where c.oid = 'public.documents'::regclass;
+
+  select coalesce(jsonb_agg(jsonb_build_object(
+    'name', i.relname,
+    'method', am.amname,
+    'bytes', pg_relation_size(i.oid),
+    'scans', coalesce(s.idx_scan, 0),
+    'tuples_read', coalesce(s.idx_tup_read, 0),
+    'valid', x.indisvalid,
+    'predicate', pg_get_expr(x.indpred, x.indrelid)
+  ) order by i.relname), '[]'::jsonb) into indexes
+  from pg_index x
+  join pg_class i on i.oid = x.indexrelid
+  join pg_am am on am.oid = i.relam
+  left join pg_stat_user_indexes s on s.indexrelid = x.indexrelid
+  where x.indrelid = 'public.documents'::regclass;
+
+  return jsonb_build_object(
+    'generated_at', now(),
+    'declared_dimensions', declared_dims,
+    'deep', deep,
+    'categories', categories,
+    'table', table_stats,
+    'indexes', indexes
+  );
+end;
+$$;
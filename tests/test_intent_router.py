@@ -0,0 +1,39 @@
+import pytest
+
+from langflow_components.src.intent_router import classify_keywords, is_small_talk
+
+
+@pytest.mark.parametrize("query", [
+    "How do I authenticate against the API?",
+    "Is OAuth supported?",
+    "Which auth header does the endpoint expect?",
+    "Our requests are not authorized",
+])
+def test_technical_keywords(query):
+    assert classify_keywords(query) == "technical"
+
+
+@pytest.mark.parametrize("query", [
+    "Tell me about the monkey",
+    "What is the capital of France?",
+    "What about authors?",
+    "Who is the author of this?",
+    "Is this an authentic report from the authority?",
+])
+def test_no_substring_matches(query):
+    assert classify_keywords(query) == "general"
+
+
+def test_business_keywords():
+    assert classify_keywords("What is the pricing for enterprise?") == "business"
+
+
+@pytest.mark.parametrize("query", ["Meridian?", "meridian pricing"])
+def test_product_questions_are_not_small_talk(query):
+    assert not is_small_talk(query)
+
+
+def test_acknowledgement_after_a_question_is_not_small_talk():
+    assert is_small_talk("ok")
+    assert not is_small_talk("ok", previous_response="Want the enterprise pricing?")
+    assert is_small_talk("thanks!", previous_response="Want the enterprise pricing?")
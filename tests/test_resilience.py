@@ -0,0 +1,208 @@
+import asyncio
+import time
+
+import pytest
+
+from langflow_components.src.resilience import CircuitBreaker, CircuitOpenError, Endpoint, TokenBucket, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class PostgrestError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def endpoint(**overrides) -> Endpoint:
+    options = dict(concurrency=4, rpm=0, timeout=5.0, attempts=3, base_delay=0.0, max_delay=0.0)
+    options.update(overrides)
+    return Endpoint("test", **options)
+
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+
+
+def half_open(breaker: CircuitBreaker):
+    open_breaker(breaker)
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+
+# --- is_retryable ---
+@pytest.mark.parametrize("exc", [
+    TimeoutError(), asyncio.TimeoutError(), ConnectionError(),
+    StatusError(408), StatusError(429), StatusError(500), StatusError(503),
+    PostgrestError("503"), PostgrestError("PGRST000"), PostgrestError("57014"), PostgrestError("08006"),
+])
+def test_transient_errors_are_retryable(exc):
+    assert is_retryable(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    ValueError("bad"), StatusError(400), StatusError(401), StatusError(404),
+    PostgrestError("404"), PostgrestError("PGRST116"), PostgrestError("23505"), PostgrestError(None),
+])
+def test_client_errors_are_not_retryable(exc):
+    assert not is_retryable(exc)
+
+
+def test_status_is_read_from_the_response():
+    exc = Exception("rate limited")
+    exc.response = type("Response", (), {"status_code": 429, "headers": {}})()
+    assert is_retryable(exc)
+
+
+# --- TokenBucket ---
+def test_bucket_serves_a_burst_then_paces():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    # Reservations queue up: the next caller waits behind the previous one
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.reserve(2)
+    bucket.updated -= 10  # long idle period
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve() > 0
+
+
+# --- CircuitBreaker ---
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.acquire() is None
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_admits_a_single_trial():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    half_open(breaker)
+    assert breaker.acquire() == "trial"
+    assert breaker.acquire() is None
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(threshold=5, reset_timeout=60)
+    half_open(breaker)
+    assert breaker.acquire() == "trial"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_released_trial_frees_the_slot():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    half_open(breaker)
+    permit = breaker.acquire()
+    breaker.release(permit)
+    assert breaker.state == "half_open"
+    assert breaker.acquire() == "trial"
+
+
+# --- Endpoint ---
+def test_retries_transient_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StatusError(503)
+        return "ok"
+
+    assert endpoint().call(flaky) == "ok"
+    assert len(calls) == 3
+
+
+def test_blocking_call_is_bounded_by_the_deadline():
+    guard = endpoint(timeout=0.3)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        guard.call(lambda: time.sleep(2))
+    assert time.monotonic() - started < 1.0
+    assert guard.call(lambda: time.sleep(2), fallback=lambda: "fallback") == "fallback"
+
+
+def test_blocking_calls_keep_the_callers_context():
+    from langflow_components.src.tracing import span, start_trace
+
+    def traced():
+        with span("inner"):
+            return "ok"
+
+    trace = start_trace()
+    assert endpoint().call(traced) == "ok"
+    assert [record["stage"] for record in trace.spans] == ["inner"]
+
+
+def test_client_error_is_not_retried_or_counted():
+    guard = endpoint()
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        guard.call(bad_request)
+    assert len(calls) == 1
+    assert guard.breaker.failures == 0
+
+
+def test_open_breaker_fails_fast_or_falls_back():
+    guard = endpoint()
+    open_breaker(guard.breaker)
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: "never")
+    assert guard.call(lambda: "never", fallback=lambda: "fallback") == "fallback"
+
+
+def test_non_retryable_trial_does_not_wedge_the_breaker():
+    guard = endpoint()
+    half_open(guard.breaker)
+    with pytest.raises(StatusError):
+        guard.call(lambda: (_ for _ in ()).throw(StatusError(404)))
+    assert guard.breaker.state == "half_open"
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_cancelled_trial_does_not_wedge_the_breaker():
+    guard = endpoint()
+    half_open(guard.breaker)
+
+    async def scenario():
+        task = asyncio.ensure_future(guard.acall(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async def ok():
+            return "ok"
+
+        return await guard.acall(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert guard.breaker.state == "closed"